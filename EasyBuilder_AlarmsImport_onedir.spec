@@ -0,0 +1,58 @@
+# -*- mode: python ; coding: utf-8 -*-
+#
+# Onedir build: a folder with the executable and its files, which starts faster than the onefile build
+# (EasyBuilder_AlarmsImport.spec) as nothing is extracted to a temporary directory at each launch.
+# UPX is disabled: the compressed DLLs would be decompressed at each launch too.
+# The time from the launch to the first window is logged at startup, to compare both builds.
+
+import re
+import pathlib
+
+# Get version from __init__.py
+base_path = pathlib.Path(os.path.abspath('.'))
+init_file = base_path / 'src' / '__init__.py'
+with open(init_file, encoding='utf-8') as f:
+    content = f.read()
+    version = re.search(r"__version__\s*=\s*['\"]([^'\"]+)['\"]", content).group(1)
+
+a = Analysis(
+    ['src\\main.py'],
+    pathex=['src\\'],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name=f'EasyBuilder_AlarmsImport_v{version}',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name=f'EasyBuilder_AlarmsImport_v{version}',
+)
@@ -0,0 +1,102 @@
+"""
+Compare the memory used to keep the symbols of a parsed file and their alarms, as Symbol and Alarm objects
+with the 'VAR://' prefixed names (previous symbol table) and as columns of the names without prefix (SymbolTable and
+AlarmTable), and the time to go through the alarms.
+
+The total memory includes the names and comments strings, the memory of the tables alone excludes them.
+
+Usage:
+    python benchmarks/bench_alarm_table.py [--symbols 1000000] [--alarms-ratio 0.5]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / 'src')]
+
+from alarm import Alarm  # noqa: E402
+from category_settings import CategorySettings  # noqa: E402
+from symbol import Symbol  # noqa: E402
+from symbol_table import SymbolTable  # noqa: E402
+
+# Address prefix of the Sysmac Studio symbols
+PREFIX = 'VAR://'
+
+
+def iter_symbols(count: int, alarms_ratio: float, categories_count: int, name_prefix: str = ''):
+    alarms_every = round(1 / alarms_ratio)
+    for i in range(count):
+        index = i % categories_count if i % alarms_every == 0 else None
+        # Types are new strings for each line, as split() returns them
+        yield Symbol(name=f'{name_prefix}Program{i % 40}.Unit{i % 7}.bAlm_{i}', type='_BOOL'[1:],
+                     comment=f'Alarm {i}\\nUnit {i % 7}'), index
+
+
+def build_objects(symbols, categories):
+    """
+    Reference implementation: previous symbol table keeping Symbol objects and building a list of Alarm.
+    """
+    table = [], []
+    for symbol, index in symbols:
+        table[0].append(symbol)
+        table[1].append(index)
+    alarms = [Alarm(symbol=symbol, category=categories[index].alarm_category)
+              for symbol, index in zip(*table) if index is not None]
+    return table, alarms
+
+
+def build_columns(symbols, categories):
+    table = SymbolTable(categories, PREFIX)
+    for symbol, index in symbols:
+        table.append(symbol, index)
+    return table, table.alarms(categories)
+
+
+def bench(label, build, args, categories, name_prefix: str):
+    strings = sum(sys.getsizeof(symbol.name) + sys.getsizeof(symbol.comment)
+                  for symbol, _ in iter_symbols(args.symbols, args.alarms_ratio, len(categories), name_prefix))
+    tracemalloc.start()
+    start = time.perf_counter()
+    # Symbols are created while the table is built, as when the file is parsed
+    table, alarms = build(iter_symbols(args.symbols, args.alarms_ratio, len(categories), name_prefix), categories)
+    duration = time.perf_counter() - start
+    total = tracemalloc.get_traced_memory()[0]
+    memory = total - strings
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for alarm in alarms:
+        alarm.category.id, alarm.symbol.name, alarm.symbol.comment
+    iteration = time.perf_counter() - start
+    print(f'{label:<10} total {total / 1e6:8.1f} MB  {total / args.symbols:6.0f} bytes/symbol  '
+          f'tables {memory / 1e6:8.1f} MB  {memory / args.symbols:6.0f} bytes/symbol  '
+          f'build {duration:6.2f}s  iteration {iteration:6.2f}s')
+    return total, memory, alarms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=1_000_000)
+    parser.add_argument('--alarms-ratio', type=float, default=0.5)
+    args = parser.parse_args()
+
+    categories = [CategorySettings(regex=f'Unit{i}', bg_color=(i, 0, 0), id=i) for i in range(8)]
+    print(f'{args.symbols} symbols')
+
+    reference_total, reference, expected = bench('objects', build_objects, args, categories, PREFIX)
+    total, memory, alarms = bench('columns', build_columns, args, categories, '')
+    print(f'memory: x{reference_total / total:.1f} less in total, x{reference / memory:.1f} less for the tables')
+
+    if any((a.category, a.symbol.name, a.symbol.type, a.symbol.comment)
+           != (b.category, b.symbol.name, b.symbol.type, b.symbol.comment) for a, b in zip(expected, alarms)) \
+            or len(expected) != len(alarms):
+        print('ERROR: the alarms differ')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Time the parse, match and write phases of the import on synthetic symbol exports and track their peak memory.
+
+The phases are timed for each source and symbols count, the match and write ones for each categories count too:
+    - parse: read the symbols of the export (iter_symbols)
+    - match: find the category of every symbol and gather the alarms (SymbolTable)
+    - write: write the alarms workbook (write_xls_from_alarms), with each XLSX engine
+
+Results are compared to a baseline saved by a previous run (on the same machine) and the suite fails if a phase
+is slower or uses more memory than its baseline by more than the tolerance.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 10000 100000 1000000] [--categories 1 16 256]
+                                     [--sources omron-sysmac codesys] [--engines xlsxwriter stream]
+                                     [--save-baseline]
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from generators import WRITERS, make_categories
+
+from alarm_import import iter_symbols, iter_matches  # noqa: E402
+from category_set import CategorySet  # noqa: E402
+from import_source import supported_import_sources  # noqa: E402
+from symbol_table import SymbolTable  # noqa: E402
+from xls_write import XlsWriteOptions, write_xls_from_alarms  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+# Differences below these ones are noise whatever the tolerance
+MIN_SECONDS_REGRESSION = 0.05
+MIN_MEMORY_REGRESSION = 1024 * 1024
+
+# XLSX writer backends, xlsxwriter being the default one of the application
+ENGINES = ('xlsxwriter', 'stream')
+
+name_to_source = {src.name: src for src in supported_import_sources}
+
+
+def parse_phase(source, fname):
+    return list(iter_symbols(source, fname))
+
+
+def match_phase(symbols, categories, name_prefix):
+    table = SymbolTable(categories, name_prefix)
+    for symbol, index in iter_matches(symbols, CategorySet(categories, name_prefix=name_prefix), all_symbols=True):
+        table.append(symbol, index)
+    return table.alarms(categories)
+
+
+def write_phase(alarms, categories, fname, options):
+    write_xls_from_alarms(str(fname), 'PLC', alarms, categories, options)
+
+
+def measure(function, *args, repeat: int = 1):
+    """
+    Return the result of the function, its best duration out of repeat runs and its peak memory.
+    The peak memory is measured by an additional run, as tracing the allocations slows down the function.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        durations.append(time.perf_counter() - start)
+        del result
+
+    tracemalloc.start()
+    result = function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(durations), peak
+
+
+def run_source(source_name: str, size: int, export, tmpdir: Path, args) -> dict:
+    """
+    Return the results of the phases on the export of size symbols, keyed by source/size/[categories/]phase
+    """
+    symbols, seconds, peak = measure(parse_phase, name_to_source[source_name], export, repeat=args.repeat)
+    key = f'{source_name}/{size}'
+    results = {f'{key}/parse': {'seconds': seconds, 'peak_bytes': peak, 'symbols_per_second': size / seconds}}
+    print_result(f'{key}/parse', results[f'{key}/parse'], args.reference.get(f'{key}/parse'))
+
+    for categories_count in args.categories:
+        categories = make_categories(categories_count)
+        alarms, seconds, peak = measure(match_phase, symbols, categories,
+                                        name_to_source[source_name].address_prefix, repeat=args.repeat)
+        results[f'{key}/{categories_count}/match'] = {'seconds': seconds, 'peak_bytes': peak,
+                                                      'symbols_per_second': size / seconds, 'alarms': len(alarms)}
+        phases = ['match']
+        for engine in args.engines:
+            _, seconds, peak = measure(write_phase, alarms, categories, tmpdir / 'alarms.xlsx',
+                                       XlsWriteOptions(engine=engine, tmpdir=str(tmpdir)), repeat=args.repeat)
+            phases.append(f'write-{engine}')
+            results[f'{key}/{categories_count}/write-{engine}'] = {
+                'seconds': seconds, 'peak_bytes': peak, 'rows_per_second': len(alarms) / seconds if alarms else 0}
+        for phase in phases:
+            phase_key = f'{key}/{categories_count}/{phase}'
+            print_result(phase_key, results[phase_key], args.reference.get(phase_key))
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float):
+    """
+    Yield a description of each phase slower or using more memory than its baseline
+    """
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        seconds, reference_seconds = result['seconds'], reference['seconds']
+        if (seconds > reference_seconds * (1 + tolerance)
+                and seconds - reference_seconds > MIN_SECONDS_REGRESSION):
+            yield f'{key}: {seconds:.3f}s instead of {reference_seconds:.3f}s'
+        peak, reference_peak = result['peak_bytes'], reference['peak_bytes']
+        if peak > reference_peak * (1 + tolerance) and peak - reference_peak > MIN_MEMORY_REGRESSION:
+            yield f'{key}: {peak / 1e6:.1f} MB peak memory instead of {reference_peak / 1e6:.1f} MB'
+
+
+def print_result(key: str, result: dict, reference: dict = None):
+    change = ''
+    if reference:
+        change = f'  ({(result["seconds"] / reference["seconds"] - 1) * 100:+.0f}% time, ' \
+                 f'{(result["peak_bytes"] / max(reference["peak_bytes"], 1) - 1) * 100:+.0f}% memory)'
+    rate = result.get('symbols_per_second') or result.get('rows_per_second', 0)
+    unit = 'symbols/s' if 'symbols_per_second' in result else 'rows/s'
+    print(f'{key:<40} {result["seconds"]:8.3f}s  {rate:10.0f} {unit:<9}  '
+          f'{result["peak_bytes"] / 1e6:8.1f} MB peak{change}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--categories', type=int, nargs='+', default=[1, 16, 256])
+    parser.add_argument('--sources', nargs='+', choices=sorted(WRITERS), default=sorted(WRITERS))
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES),
+                        help="XLSX writer backends timed by the write phase (default: all)")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs of each phase, the best time is kept")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown or memory increase over the baseline (default: %(default)s)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Save the results as the new baseline instead of comparing them")
+    args = parser.parse_args()
+
+    machine = f'{platform.node()} {platform.machine()} Python {platform.python_version()}'
+    baseline = args.reference = {}
+    if args.baseline.is_file() and not args.save_baseline:
+        with args.baseline.open() as f:
+            saved = json.load(f)
+        baseline = args.reference = saved['results']
+        if saved.get('machine') != machine:
+            print(f'WARNING: baseline measured on {saved.get("machine")}, not on {machine}')
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        for source_name in args.sources:
+            for size in args.sizes:
+                # Exports are generated and parsed once for all the category sets
+                export = tmpdir / f'{source_name}-{size}'
+                WRITERS[source_name](export, size)
+                results.update(run_source(source_name, size, export, tmpdir, args))
+                export.unlink()
+
+    if args.save_baseline:
+        with args.baseline.open('w') as f:
+            json.dump({'machine': machine, 'results': results}, f, indent=1, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not baseline:
+        print(f'No baseline found in {args.baseline}, run with --save-baseline to create it')
+        return 0
+    regressions = list(find_regressions(results, baseline, args.tolerance))
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    missing = len(set(results) - set(baseline))
+    if missing:
+        print(f'{missing} phases not found in the baseline')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Compare the MB/s of the Sysmac Studio symbols file reading, line by line (previous reader, failing on malformed
+lines) and by blocks (iter_sysmac_symbols), on a generated export. Check both readers return the same symbols and
+the block reader skips the malformed lines of a second export.
+
+Usage:
+    python benchmarks/bench_sysmac_reader.py [--size-mb 300] [--encoding utf-8-sig]
+"""
+import argparse
+import itertools
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / 'src')]
+
+from symbol import Symbol  # noqa: E402
+from sysmac_symbols import MalformedLines, iter_sysmac_symbols  # noqa: E402
+
+# Lines inserted in the export checking the malformed lines are skipped
+MALFORMED_LINES = ['Program1 variables', '', '\tBOOL\t\tNo name', '(* comment *)']
+
+
+def write_export(fname, size: int, encoding: str, malformed_every: int = 0) -> int:
+    """
+    Write a Sysmac Studio like symbols export of about size bytes and return its number of symbols.
+    """
+    count = 0
+    written = 0
+    with open(fname, 'w', encoding=encoding, newline='\r\n') as f:
+        while written < size:
+            lines = []
+            for i in range(count, count + 10000):
+                lines.append(f'Program{i % 40}.Unit{i % 7}.bAlm_{i}\tBOOL\t\tDéfaut {i} unité {i % 7}\n')
+                if malformed_every and i % malformed_every == 0:
+                    lines.extend(f'{line}\n' for line in MALFORMED_LINES)
+            count += 10000
+            block = ''.join(lines)
+            f.write(block)
+            written += len(block)
+    return count
+
+
+def iter_sysmac_symbols_by_line(symbols_filepath, encoding: str):
+    """
+    Reference implementation: previous line by line reader.
+    """
+    with open(symbols_filepath, encoding=encoding) as f:
+        for line in f:
+            fields = line.strip().split('\t')
+            name = "VAR://" + fields[0]
+            yield Symbol(name=name, type=fields[1], comment=fields[3])
+
+
+def bench(label, symbols, size: int):
+    # Symbols aren't kept, so the garbage collection of a reader doesn't depend on the previous one
+    start = time.perf_counter()
+    count = sum(1 for _ in symbols)
+    duration = time.perf_counter() - start
+    print(f'{label:<20} {duration:7.2f}s  {size / duration / 1e6:8.1f} MB/s  {count / duration:10.0f} symbols/s')
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=300)
+    parser.add_argument('--encoding', default='utf-8-sig')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = Path(tmpdir) / 'symbols.txt'
+        count = write_export(fname, args.size_mb * 1_000_000, args.encoding)
+        size = fname.stat().st_size
+        print(f'{count} symbols, {size / 1e6:.0f} MB ({args.encoding})')
+
+        reference = bench('line by line', iter_sysmac_symbols_by_line(fname, args.encoding), size)
+        duration = bench('blocks', iter_sysmac_symbols(fname), size)
+        print(f'speedup: x{reference / duration:.2f}')
+        sentinel = object()
+        if any(a != b for a, b in itertools.zip_longest(iter_sysmac_symbols_by_line(fname, args.encoding),
+                                                        iter_sysmac_symbols(fname), fillvalue=sentinel)):
+            print('ERROR: the symbols read differ')
+            return 1
+
+        malformed_every = 1000
+        count = write_export(fname, args.size_mb * 1_000_000 // 10, args.encoding, malformed_every)
+        malformed = MalformedLines()
+        symbols_count = sum(1 for _ in iter_sysmac_symbols(fname, malformed=malformed))
+        expected_malformed = count // malformed_every * (len(MALFORMED_LINES) - 1)
+        if symbols_count != count or malformed.count != expected_malformed:
+            print(f'ERROR: {symbols_count} symbols and {malformed.count} malformed lines read, '
+                  f'{count} and {expected_malformed} expected')
+            return 1
+        print(f'{malformed.count} malformed lines skipped, every symbol read')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Compare the rows/sec of the XLSX writing with per-cell writes (get_row_data + write_row)
+and with precomputed row templates (write_rows_from_alarms).
+
+Usage:
+    python benchmarks/bench_xls_write.py [--alarms 100000]
+"""
+import argparse
+import itertools
+import sys
+import tempfile
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / 'src')]
+
+import xlsxwriter  # noqa: E402
+
+from alarm import Alarm  # noqa: E402
+from category_settings import CategorySettings  # noqa: E402
+from symbol import Symbol  # noqa: E402
+from xls_write import get_row_data, write_headers, write_row, write_xls_from_alarms  # noqa: E402
+
+NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def make_alarms(count: int, categories):
+    return [
+        Alarm(symbol=Symbol(name=f'VAR://Program{i % 40}.Unit{i % 7}.bAlm_{i}', type='BOOL',
+                            comment=f'Alarm {i}\\nUnit {i % 7}'),
+              category=categories[i % len(categories)].alarm_category)
+        for i in range(count)
+    ]
+
+
+def write_xls_per_cell(fname, plc_name, alarms, categories_settings):
+    """
+    Reference implementation: build and write the whole row cell by cell for every alarm.
+    """
+    with xlsxwriter.Workbook(fname) as workbook:
+        worksheet = workbook.add_worksheet()
+        write_headers(worksheet)
+        for row_id, alarm in enumerate(alarms, start=2):
+            write_row(worksheet, row_id, get_row_data(alarm.category.id, plc_name, alarm.symbol, categories_settings))
+
+
+def iter_cells(fname):
+    """
+    Yield the (reference, value) cells of the first worksheet of a XLSX file without loading the whole sheet.
+    """
+    with zipfile.ZipFile(fname) as z:
+        strings = []
+        if 'xl/sharedStrings.xml' in z.namelist():
+            for si in ET.fromstring(z.read('xl/sharedStrings.xml')).iterfind('m:si', NS):
+                strings.append(''.join(t.text or '' for t in si.iter(f'{{{NS["m"]}}}t')))
+        with z.open('xl/worksheets/sheet1.xml') as sheet:
+            for _, c in ET.iterparse(sheet):
+                if c.tag != f'{{{NS["m"]}}}c':
+                    continue
+                if c.get('t') == 's':
+                    value = strings[int(c.find('m:v', NS).text)]
+                elif c.get('t') == 'inlineStr':
+                    value = ''.join(t.text or '' for t in c.iter(f'{{{NS["m"]}}}t'))
+                else:
+                    value = c.find('m:v', NS).text
+                yield c.get('r'), value
+                c.clear()
+
+
+def same_cells(fname, other_fname) -> bool:
+    sentinel = object()
+    return all(a == b for a, b in itertools.zip_longest(iter_cells(fname), iter_cells(other_fname),
+                                                         fillvalue=sentinel))
+
+
+def bench(label, function, *args):
+    start = time.perf_counter()
+    function(*args)
+    duration = time.perf_counter() - start
+    rows = len(args[2])
+    print(f'{label:<20} {duration:7.2f}s  {rows / duration:10.0f} rows/s')
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alarms', type=int, default=100_000)
+    args = parser.parse_args()
+
+    categories = [CategorySettings(regex=f'Unit{i}', bg_color=(i, 0, 0)) for i in range(8)]
+    # Rows reference the categories by id
+    categories = {category.alarm_category.id: category for category in categories}
+    alarms = make_alarms(args.alarms, list(categories.values()))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        before = Path(tmpdir) / 'per_cell.xlsx'
+        after = Path(tmpdir) / 'templates.xlsx'
+        reference = bench('per cell writes', write_xls_per_cell, str(before), 'PLC', alarms, categories)
+        duration = bench('row templates', write_xls_from_alarms, str(after), 'PLC', alarms, categories)
+        print(f'speedup: x{reference / duration:.2f}')
+
+        if not same_cells(before, after):
+            print('ERROR: the workbooks content differ')
+            return 1
+        print('workbooks content is identical')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Compare the xlsxwriter and the stream XLSX writer backends: check both workbooks have the same cells
+and the stream workbook is a valid package, then report rows/sec of each backend.
+
+Usage:
+    python benchmarks/bench_xlsx_engines.py [--alarms 100000]
+"""
+import argparse
+import sys
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from bench_xls_write import bench, make_alarms, same_cells
+
+from category_settings import CategorySettings
+from xls_write import XlsWriteOptions, write_xls_from_alarms
+
+
+def check_package(fname) -> bool:
+    """
+    Check every part of the package is well-formed XML and the stream package has the parts of the xlsxwriter one.
+    """
+    with zipfile.ZipFile(fname) as z:
+        if z.testzip() is not None:
+            return False
+        for name in z.namelist():
+            with z.open(name) as part:
+                for _ in ET.iterparse(part):
+                    pass
+        required = {'[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels',
+                    'xl/styles.xml', 'xl/worksheets/sheet1.xml', 'xl/sharedStrings.xml'}
+        return required <= set(z.namelist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alarms', type=int, default=100_000)
+    args = parser.parse_args()
+
+    categories = [CategorySettings(regex=f'Unit{i}', bg_color=(i, 0, 0)) for i in range(8)]
+    # Rows reference the categories by id
+    categories = {category.alarm_category.id: category for category in categories}
+    alarms = make_alarms(args.alarms, list(categories.values()))
+    # Escaping corner cases
+    alarms[0].symbol.comment = ' <Alarm> & "quotes" _x0041_ \x01 '
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        reference_fname = Path(tmpdir) / 'xlsxwriter.xlsx'
+        stream_fname = Path(tmpdir) / 'stream.xlsx'
+        xlsxwriter_options = XlsWriteOptions(engine='xlsxwriter', tmpdir=tmpdir)
+        stream_options = XlsWriteOptions(engine='stream', tmpdir=tmpdir)
+
+        reference = bench('xlsxwriter', write_xls_from_alarms,
+                          str(reference_fname), 'PLC', alarms, categories, xlsxwriter_options)
+        duration = bench('stream', write_xls_from_alarms,
+                         str(stream_fname), 'PLC', alarms, categories, stream_options)
+        print(f'speedup: x{reference / duration:.2f}')
+        print(f'size: {reference_fname.stat().st_size} bytes (xlsxwriter), {stream_fname.stat().st_size} bytes (stream)')
+
+        if not check_package(stream_fname):
+            print('ERROR: invalid stream workbook package')
+            return 1
+        if not same_cells(reference_fname, stream_fname):
+            print('ERROR: the workbooks content differ')
+            return 1
+        print('workbooks content is identical')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
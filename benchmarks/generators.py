@@ -0,0 +1,116 @@
+"""
+Synthetic PLC symbol exports and category sets for the benchmarks.
+
+Everything is generated from a seed, so the same arguments always give the same files and categories.
+"""
+import random
+import sys
+from pathlib import Path
+from typing import List
+from xml.sax.saxutils import quoteattr
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / 'src')]
+
+from category_settings import CategorySettings  # noqa: E402
+
+PROGRAMS = ['Main', 'Conveyor', 'Press', 'Robot', 'Oven', 'Palletizer', 'Wrapper', 'Labeler']
+UNITS = ['Infeed', 'Outfeed', 'Motor', 'Valve', 'Sensor', 'Door', 'Pump', 'Heater', 'Axis', 'Gripper']
+# (prefix, type) of the variables, alarms being the BOOL ones
+VARIABLES = [('bAlm', 'BOOL'), ('bErr', 'BOOL'), ('bWarn', 'BOOL'), ('xFault', 'BOOL'), ('bReady', 'BOOL'),
+             ('iCount', 'INT'), ('rSpeed', 'REAL'), ('sName', 'STRING[32]'), ('tDelay', 'TIME'),
+             ('aFlags', 'ARRAY[0..15] OF BOOL')]
+WORDS = ['Défaut', 'Alarme', 'Fault', 'Warning', 'moteur', 'vanne', 'capteur', 'porte', 'ouverte', 'surcharge',
+         'température', 'haute', 'basse', 'timeout', 'sécurité', 'arrêt', 'urgence', 'pression', 'niveau', 'bourrage']
+# Templates of the category filters, most of them having a required literal as the real ones
+FILTER_TEMPLATES = [
+    r'\.{variable}_\d+$',
+    r'[/.]{program}\.{unit}\d+\.{variable}',
+    r'{unit}\d*\.(bAlm|bErr)_',
+    r'[/.]{program}\.',
+    r'(?i){unit}\d+\.x?fault',
+    r'{program}\.{unit}[0-3]\.',
+    r'_{number}$',
+    r'\.{variable}_[0-9]*{number}$',
+]
+
+
+def symbol_fields(rng: random.Random, i: int):
+    """
+    Return the (program, unit, variable, type, comment) of the i-th generated symbol
+    """
+    prefix, symbol_type = VARIABLES[rng.randrange(len(VARIABLES))]
+    program = PROGRAMS[i % len(PROGRAMS)]
+    unit = f'{rng.choice(UNITS)}{rng.randrange(20)}'
+    comment_kind = rng.random()
+    if comment_kind < 0.1:
+        comment = ''
+    else:
+        comment = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        if comment_kind > 0.9:
+            # Multiline message, as written in Sysmac Studio
+            comment += '\\n' + ' '.join(rng.choice(WORDS) for _ in range(3))
+    return program, unit, f'{prefix}_{i}', symbol_type, comment
+
+
+def write_sysmac_export(fname, count: int, seed: int = 0):
+    """
+    Write a Sysmac Studio symbols export (tab separated, UTF-8 with BOM, CRLF) of count symbols
+    """
+    rng = random.Random(seed)
+    with open(fname, 'w', encoding='utf-8-sig', newline='\r\n') as f:
+        for start in range(0, count, 10000):
+            lines = []
+            for i in range(start, min(start + 10000, count)):
+                program, unit, variable, symbol_type, comment = symbol_fields(rng, i)
+                lines.append(f'{program}.{unit}.{variable}\t{symbol_type}\t\t{comment}\n')
+            f.write(''.join(lines))
+
+
+def write_codesys_export(fname, count: int, seed: int = 0):
+    """
+    Write a CODESYS symbol configuration file of count symbols, with the same paths as the Sysmac Studio ones
+    (e.g. Application.Main.Motor3.bAlm_12)
+    """
+    rng = random.Random(seed)
+    types = sorted({symbol_type for _, symbol_type in VARIABLES})
+    with open(fname, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                '<Symbolconfiguration xmlns="http://www.3s-software.com/schemas/Symbolconfiguration.xsd">\n'
+                '<TypeList>\n')
+        for symbol_type in types:
+            f.write(f'<TypeSimple name={quoteattr("T_" + symbol_type)} size="1" '
+                    f'iecname={quoteattr(symbol_type)} />\n')
+        f.write('</TypeList>\n<NodeList>\n<Node name="Application">\n')
+        for start in range(0, count, 10000):
+            lines = []
+            for i in range(start, min(start + 10000, count)):
+                program, unit, variable, symbol_type, comment = symbol_fields(rng, i)
+                lines.append(f'<Node name="{program}"><Node name="{unit}">'
+                             f'<Node name="{variable}" type={quoteattr("T_" + symbol_type)} access="ReadWrite" '
+                             f'comment={quoteattr(comment)} /></Node></Node>\n')
+            f.write(''.join(lines))
+        f.write('</Node>\n</NodeList>\n</Symbolconfiguration>\n')
+
+
+def make_categories(count: int, seed: int = 0) -> List[CategorySettings]:
+    """
+    Return count categories with filters built as the ones of real projects, specific filters (e.g. a variable of a
+    unit) and broad ones (e.g. every variable of a program) alternating
+    """
+    rng = random.Random(seed)
+    categories = []
+    for i in range(count):
+        template = FILTER_TEMPLATES[i % len(FILTER_TEMPLATES)]
+        regex = template.format(program=rng.choice(PROGRAMS), unit=rng.choice(UNITS),
+                                variable=rng.choice(VARIABLES)[0], number=rng.randrange(10))
+        categories.append(CategorySettings(name=f'Category {i}', regex=regex,
+                                           bg_color=(rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+                                           id=i))
+    return categories
+
+
+WRITERS = {
+    'omron-sysmac': write_sysmac_export,
+    'codesys': write_codesys_export,
+}
@@ -1,7 +1,7 @@
 import re
 from dataclasses import dataclass, field
 from itertools import count
-from typing import Tuple
+from typing import Optional, Tuple
 
 
 def rgb_to_hex(red, green, blue):
@@ -16,7 +16,8 @@ class AlarmCategory:
     fg_color: Tuple[int, int, int] = (0, 0, 0) # Black
     id: int = field(default_factory=count().__next__)
 
-    pattern: re.Pattern = field(init=False, repr=False)
+    # Compiled on first use, so categories which are never searched aren't compiled
+    _pattern: Optional[re.Pattern] = field(init=False, repr=False, compare=False, default=None)
 
     def is_match(self, symbol_name: str) -> bool:
         return self.pattern.search(symbol_name) is not None
@@ -36,5 +37,11 @@ class AlarmCategory:
     @regex.setter
     def regex(self, value: str):
         self._regex = value
-        # Avoid using '' as default regexp as it matches everything ... Use '^$' to match nothing
-        self.pattern = re.compile(self._regex if self._regex != '' else r'^$')
+        self._pattern = None
+
+    @property
+    def pattern(self) -> re.Pattern:
+        if self._pattern is None:
+            # Avoid using '' as default regexp as it matches everything ... Use '^$' to match nothing
+            self._pattern = re.compile(self._regex if self._regex != '' else r'^$')
+        return self._pattern
@@ -0,0 +1,221 @@
+import itertools
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from alarm_table import AlarmRow
+from category_set import CategorySet
+from category_settings import CategorySettings
+from codesys_symbols import iter_codesys_symbols
+from import_source import ImportSource
+from parallel_parse import iter_sysmac_matches_parallel
+from progress import UPDATE_EVERY, ProgressReporter
+from symbol import Symbol
+from symbol_cache import SymbolCache
+from symbol_table import SymbolTable
+from sysmac_symbols import MalformedLines, detect_encoding, is_byte_splittable, iter_sysmac_symbols
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ParseOptions:
+    """
+    Settings of the symbol files parsing.
+    """
+    # Number of processes used to parse large files (0: one per CPU, 1: parallel parsing disabled)
+    workers: int = 0
+    # Files smaller than this size (in bytes) are parsed in the current process
+    parallel_threshold: int = 64 * 1024 * 1024
+    # Keep the parsed symbols in the on-disk cache so an unchanged file isn't parsed again
+    use_cache: bool = False
+    # Total size of the cache entries (in bytes)
+    cache_max_size: int = 256 * 1024 * 1024
+
+
+@dataclass
+class ImportSummary:
+    """
+    Statistics gathered while symbols flow through the import pipeline.
+    """
+    symbols: int = 0
+    alarms: int = 0
+    # Number of alarms by category index
+    categories: Counter = field(default_factory=Counter)
+    # Lines of the symbols file skipped as they don't define a symbol
+    malformed: MalformedLines = field(default_factory=MalformedLines)
+    # Wall time (in seconds) spent reading, parsing and matching the symbols, by phase
+    seconds: Counter = field(default_factory=Counter)
+    # Category filter patterns searched to match the symbols
+    regex_evaluations: int = 0
+
+
+def iter_symbols(import_src: ImportSource, symbols_filepath, progress: ProgressReporter = None,
+                 malformed: MalformedLines = None, timings: Counter = None) -> Iterator[Symbol]:
+    if import_src.name == 'codesys':
+        return iter_codesys_symbols(symbols_filepath, progress, timings)
+    elif import_src.name == 'omron-sysmac':
+        return iter_sysmac_symbols(symbols_filepath, progress, malformed, timings)
+    raise ValueError(f'Unsupported import source: {import_src.name}')
+
+
+def iter_matches(symbols: Iterable[Symbol], category_set: CategorySet, summary: ImportSummary = None,
+                 all_symbols: bool = False, progress: ProgressReporter = None
+                 ) -> Iterator[Tuple[Symbol, Optional[int]]]:
+    """
+    Yield (symbol, category index) for every symbol matching a category,
+    or for every symbol (with a None index when not matching) if all_symbols is set.
+
+    If a summary or a progress is given, they are updated as the symbols are consumed.
+    Symbols are parsed and matched by batches in order to time these phases (see ImportSummary.seconds) without
+    slowing them down.
+    """
+    if summary is None:
+        summary = ImportSummary()
+    symbols = iter(symbols)
+    seconds = summary.seconds
+    match = category_set.match
+    while True:
+        start = time.perf_counter()
+        read_seconds = seconds['read']
+        batch = list(itertools.islice(symbols, UPDATE_EVERY))
+        parsed = time.perf_counter()
+        # The symbols reader times the reading itself
+        seconds['parse'] += parsed - start - (seconds['read'] - read_seconds)
+        if not batch:
+            return
+
+        evaluations = category_set.regex_evaluations
+        indexes = [match(symbol.name) for symbol in batch]
+        seconds['match'] += time.perf_counter() - parsed
+        summary.regex_evaluations += category_set.regex_evaluations - evaluations
+        summary.symbols += len(batch)
+        if progress is not None:
+            progress.update(symbols=summary.symbols)
+
+        for symbol, index in zip(batch, indexes):
+            if index is not None:
+                summary.alarms += 1
+                summary.categories[index] += 1
+            elif not all_symbols:
+                continue
+            yield symbol, index
+
+
+def iter_file_matches(import_src: ImportSource, symbols_filepath, categories: List[CategorySettings],
+                      summary: ImportSummary = None, options: ParseOptions = None,
+                      all_symbols: bool = False, progress: ProgressReporter = None
+                      ) -> Iterator[Tuple[Symbol, Optional[int]]]:
+    """
+    Yield the (symbol, category index) of a symbols file in the file order, as iter_matches() does.
+
+    Symbols are read from the cache when the file didn't change since it was last parsed. Otherwise, large Sysmac
+    Studio files are split in chunks parsed by a pool of processes according to the options.
+    The progress, if given, is updated with the bytes read and the symbols parsed, and may cancel the parsing.
+    """
+    if summary is None:
+        summary = ImportSummary()
+    if options is None:
+        options = ParseOptions()
+    if progress is not None:
+        progress.update(total_bytes=os.path.getsize(symbols_filepath))
+
+    cache = cache_key = None
+    if options.use_cache:
+        cache = SymbolCache(options.cache_max_size)
+        start = time.perf_counter()
+        cache_key = cache.key(import_src, symbols_filepath)
+        # The entry is read as the symbols are consumed, the cache times its reading itself
+        cached_symbols = cache.load(cache_key, summary.malformed, progress, summary.seconds)
+        summary.seconds['read'] += time.perf_counter() - start
+        if cached_symbols is not None:
+            yield from iter_matches(cached_symbols, CategorySet(categories, name_prefix=import_src.address_prefix),
+                                    summary, all_symbols, progress)
+            return
+
+    encoding = None
+    if (import_src.name == 'omron-sysmac'
+            and options.workers != 1
+            and os.path.getsize(symbols_filepath) >= options.parallel_threshold):
+        # The whole file is read to detect its encoding, it is only done once for the parsing processes
+        encoding = detect_encoding(symbols_filepath)
+    if encoding is None or not is_byte_splittable(encoding):
+        symbols = iter_symbols(import_src, symbols_filepath, progress, summary.malformed, summary.seconds)
+        if cache:
+            symbols = cache.store(cache_key, symbols, summary.malformed)
+        yield from iter_matches(symbols, CategorySet(categories, name_prefix=import_src.address_prefix), summary,
+                                all_symbols, progress)
+        return
+
+    yield from _iter_parallel_matches(symbols_filepath, encoding, import_src.address_prefix, categories, summary,
+                                      options, cache, cache_key, all_symbols, progress)
+
+
+def _iter_parallel_matches(symbols_filepath, encoding: str, name_prefix: str, categories: List[CategorySettings],
+                           summary: ImportSummary, options: ParseOptions, cache: SymbolCache = None,
+                           cache_key: str = None, all_symbols: bool = False, progress: ProgressReporter = None
+                           ) -> Iterator[Tuple[Symbol, Optional[int]]]:
+    # Every symbol is needed to fill the cache, not only the matching ones
+    chunks = iter_sysmac_matches_parallel(symbols_filepath, categories, options.workers,
+                                          all_symbols=all_symbols or cache is not None, encoding=encoding,
+                                          name_prefix=name_prefix)
+    lines_read = 0
+    with cache.writer(cache_key, summary.malformed) if cache else nullcontext() as cache_writer:
+        while True:
+            # The chunks are read, parsed and matched by the worker processes while waiting for them
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            end, lines_count, symbols_count, matches, malformed, regex_evaluations = chunk
+            summary.symbols += symbols_count
+            summary.regex_evaluations += regex_evaluations
+            # Line numbers of the chunk start at 1
+            summary.malformed.extend(malformed, lines_read)
+            lines_read += lines_count
+            if progress is not None:
+                progress.update(bytes_read=end, symbols=summary.symbols)
+            symbols = [(Symbol(name=name, type=symbol_type, comment=comment), index)
+                       for name, symbol_type, comment, index in matches]
+            summary.seconds['parse'] += time.perf_counter() - start
+            for symbol, index in symbols:
+                if cache_writer:
+                    cache_writer.add(symbol)
+                if index is not None:
+                    summary.alarms += 1
+                    summary.categories[index] += 1
+                elif not all_symbols:
+                    continue
+                yield symbol, index
+    if summary.malformed:
+        logger.warning(f'{symbols_filepath}: {summary.malformed}')
+
+
+def iter_file_alarms(import_src: ImportSource, symbols_filepath, categories: List[CategorySettings],
+                     summary: ImportSummary = None, options: ParseOptions = None,
+                     progress: ProgressReporter = None) -> Iterator[AlarmRow]:
+    """
+    Yield the alarms of a symbols file in the file order, the symbol names having their address prefix.
+    """
+    prefix = import_src.address_prefix
+    for symbol, index in iter_file_matches(import_src, symbols_filepath, categories, summary, options,
+                                           progress=progress):
+        yield AlarmRow(prefix + symbol.name, symbol.type, symbol.comment, categories[index].alarm_category)
+
+
+def read_symbol_table(import_src: ImportSource, symbols_filepath, categories: List[CategorySettings],
+                      summary: ImportSummary = None, options: ParseOptions = None,
+                      progress: ProgressReporter = None) -> SymbolTable:
+    """
+    Read every symbol of a symbols file with the index of its category, so they can be categorized again later.
+    """
+    table = SymbolTable(categories, import_src.address_prefix)
+    for symbol, index in iter_file_matches(import_src, symbols_filepath, categories, summary, options,
+                                           all_symbols=True, progress=progress):
+        table.append(symbol, index)
+    return table
@@ -0,0 +1,68 @@
+from array import array
+from typing import Iterator, List, Sequence
+
+from alarm_category import AlarmCategory
+
+
+class AlarmRow:
+    """
+    Lazy view of an alarm of an AlarmTable, created on access.
+
+    It has the attributes of an Alarm used to write the alarms: row.category, and row.symbol.name,
+    row.symbol.type and row.symbol.comment (the row is its own symbol view, no Symbol is created).
+    """
+    __slots__ = ('name', 'type', 'comment', 'category')
+
+    def __init__(self, name: str, type: str, comment: str, category: AlarmCategory):
+        self.name = name
+        self.type = type
+        self.comment = comment
+        self.category = category
+
+    @property
+    def symbol(self) -> 'AlarmRow':
+        return self
+
+    def __repr__(self):
+        return f'AlarmRow(name={self.name!r}, type={self.type!r}, comment={self.comment!r}, category={self.category})'
+
+
+class AlarmTable(Sequence[AlarmRow]):
+    """
+    Alarms of a SymbolTable as columns: the row of each alarm in the symbol table and its category index.
+
+    Names, comments and types are not copied, they are read from the symbol table columns when a row is accessed.
+    The name of a row is its symbol name with the name_prefix of the symbol table added in front.
+    The category indexes are a snapshot, so the table isn't changed when the symbols are categorized again.
+    It can be given to write_xls_from_alarms() as a list of Alarm.
+    """
+    def __init__(self, names: List[str], comments: List[str], types: List[str], type_ids: array,
+                 rows: array, category_indexes: array, categories: List[AlarmCategory], name_prefix: str = ''):
+        self._names = names
+        self._name_prefix = name_prefix
+        self._comments = comments
+        self._types = types
+        self._type_ids = type_ids
+        self.rows = rows
+        self.category_indexes = category_indexes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> AlarmRow:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = self.rows[index]
+        return AlarmRow(self._name_prefix + self._names[row], self._types[self._type_ids[row]], self._comments[row],
+                        self.categories[self.category_indexes[index]])
+
+    def __iter__(self) -> Iterator[AlarmRow]:
+        names = self._names
+        name_prefix = self._name_prefix
+        comments = self._comments
+        types = self._types
+        type_ids = self._type_ids
+        categories = self.categories
+        for row, category_index in zip(self.rows, self.category_indexes):
+            yield AlarmRow(name_prefix + names[row], types[type_ids[row]], comments[row], categories[category_index])
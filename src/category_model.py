@@ -0,0 +1,122 @@
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from category_settings import CategorySettings
+
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryModel:
+    """
+    Observable list of categories settings tracking the changes not saved yet.
+
+    Categories are changed through the model only. Each change notifies the listeners with the category row, and
+    each filter change increments the version of the category, so results computed from an older filter (e.g. match
+    counts) can be recognized. The values saved of a changed category are recorded on its first change, so a category
+    edited back to its saved values is no longer dirty and the changes can be reverted.
+    Checking for unsaved changes doesn't depend on the number of categories.
+    """
+    def __init__(self, categories: List[CategorySettings]):
+        self.categories = categories
+        # Number of filter changes, by row
+        self._versions = [0] * len(categories)
+        # Saved (name, filter, background color, foreground color) of the changed categories, by row
+        self._saved_values: Dict[int, Tuple] = {}
+        self.dirty = set()
+        self._listeners: List[Callable[[int], None]] = []
+
+    def __len__(self):
+        return len(self.categories)
+
+    def __getitem__(self, row: int) -> CategorySettings:
+        return self.categories[row]
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    @staticmethod
+    def _values(category: CategorySettings) -> Tuple:
+        alarm_category = category.alarm_category
+        return category.name, alarm_category.regex, tuple(alarm_category.bg_color), tuple(alarm_category.fg_color)
+
+    def append(self, category: CategorySettings) -> int:
+        """
+        Add a category with the lowest priority and return its row
+        """
+        self.categories.append(category)
+        self._versions.append(0)
+        return len(self.categories) - 1
+
+    def subscribe(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def version(self, row: int) -> int:
+        """
+        Return the version of the category filter, changed each time the filter is changed
+        """
+        return self._versions[row]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.dirty)
+
+    def set_name(self, row: int, name: str):
+        self._update(row, lambda category: setattr(category, 'name', name), name != self.categories[row].name)
+
+    def set_filter(self, row: int, regex: str):
+        """
+        Change the filter of a category, raise re.error if the regex is not valid
+        """
+        alarm_category = self.categories[row].alarm_category
+        self._update(row, lambda category: setattr(category.alarm_category, 'regex', regex),
+                     regex != alarm_category.regex)
+
+    def set_bg_color(self, row: int, color: Tuple[int, int, int]):
+        alarm_category = self.categories[row].alarm_category
+        self._update(row, lambda category: setattr(category.alarm_category, 'bg_color', color),
+                     tuple(color) != tuple(alarm_category.bg_color))
+
+    def set_fg_color(self, row: int, color: Tuple[int, int, int]):
+        alarm_category = self.categories[row].alarm_category
+        self._update(row, lambda category: setattr(category.alarm_category, 'fg_color', color),
+                     tuple(color) != tuple(alarm_category.fg_color))
+
+    def _update(self, row: int, change: Callable[[CategorySettings], None], changed: bool):
+        if not changed:
+            return
+        category = self.categories[row]
+        saved_values = self._saved_values.setdefault(row, self._values(category))
+        regex = category.alarm_category.regex
+        change(category)
+        if category.alarm_category.regex != regex:
+            self._versions[row] += 1
+
+        if self._values(category) == saved_values:
+            del self._saved_values[row]
+            self.dirty.discard(row)
+        else:
+            self.dirty.add(row)
+
+        for listener in self._listeners:
+            listener(row)
+
+    def mark_saved(self) -> Dict[int, CategorySettings]:
+        """
+        Return the changed categories by row and consider them saved
+        """
+        changed = {row: self.categories[row] for row in sorted(self.dirty)}
+        self.dirty.clear()
+        self._saved_values.clear()
+        return changed
+
+    def revert(self):
+        """
+        Restore the saved values of the changed categories
+        """
+        for row, (name, regex, bg_color, fg_color) in list(self._saved_values.items()):
+            self.set_name(row, name)
+            self.set_filter(row, regex)
+            self.set_bg_color(row, bg_color)
+            self.set_fg_color(row, fg_color)
+        logger.debug('Categories changes reverted')
@@ -0,0 +1,163 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from alarm_category import AlarmCategory
+from category_settings import CategorySettings
+from literal_index import LiteralIndex, extract_required_literal
+
+
+logger = logging.getLogger(__name__)
+
+# Numbered or named backreferences can't be renumbered when several filters are merged into one pattern
+_BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def is_mergeable(pattern: re.Pattern) -> bool:
+    """
+    Return True if the compiled filter can safely be merged with other filters into a single pattern.
+
+    Filters defining named groups (names could collide), backreferences (group numbers are shifted once merged)
+    or global flags (only allowed at the start of a pattern) are kept apart and searched on their own.
+    """
+    if pattern.groupindex or pattern.flags & ~re.UNICODE:
+        return False
+    return _BACKREFERENCE_RE.search(pattern.pattern) is None
+
+
+class _MergedFilters:
+    """
+    Several consecutive category filters merged into a single compiled pattern.
+
+    Each filter is wrapped in a lookahead anchored at the start of the symbol name, followed by an empty marker group
+    named after the category index. The alternation is tried in order so the first filter matching anywhere in the
+    name wins, exactly as searching each filter in turn would do.
+    """
+    def __init__(self, indexes: List[int], patterns: List[re.Pattern]):
+        self.indexes = indexes
+        alternatives = [f'(?=(?s:.*?)(?:{p.pattern}))(?P<_{i}>)' for i, p in zip(indexes, patterns)]
+        self.pattern = re.compile('|'.join(alternatives))
+
+    def match(self, symbol_name: str) -> Optional[int]:
+        m = self.pattern.match(symbol_name)
+        if m is None:
+            return None
+        return int(m.lastgroup[1:])
+
+
+class _SingleFilter:
+    def __init__(self, index: int, pattern: re.Pattern):
+        self.indexes = [index]
+        self.index = index
+        self.pattern = pattern
+
+    def match(self, symbol_name: str) -> Optional[int]:
+        return self.index if self.pattern.search(symbol_name) is not None else None
+
+
+class CategorySet:
+    """
+    Compiled view of the categories filters used to find the category of many symbols.
+
+    It is intended to be built once per parse. Categories having no filter are skipped.
+    Filters containing a required literal (e.g. 'Err' for 'Err\\d+') are indexed by this literal and only searched
+    when it appears in the symbol name. The remaining filters are merged into as few patterns as possible.
+    The priority is kept: the first category (lowest index) matching the symbol name wins.
+
+    Categories before the start index are ignored, in order to only look for lower priority categories.
+    The filters are searched in the symbol names with name_prefix added in front (see ImportSource.address_prefix).
+    """
+    def __init__(self, categories: List[CategorySettings], start: int = 0, name_prefix: str = ''):
+        self.categories = categories
+        self.name_prefix = name_prefix
+        # Number of patterns searched by match() so far
+        self.regex_evaluations = 0
+        # Stages always searched, ordered by priority
+        self._stages = []
+        # Stages searched only when their literal is found, by category index
+        self._literal_stages = {}
+
+        literals = []
+        pending_indexes = []
+        pending_patterns = []
+        for index, category in enumerate(categories[start:], start=start):
+            alarm_category = category.alarm_category
+            # Empty filters are '^$' placeholders which never match a symbol name
+            if alarm_category.regex == '':
+                continue
+
+            try:
+                pattern = alarm_category.pattern
+            except re.error as e:
+                logger.warning(f'Category {index} filter "{alarm_category.regex}" ignored: {e}')
+                continue
+
+            literal = extract_required_literal(pattern)
+            if literal is None and is_mergeable(pattern):
+                pending_indexes.append(index)
+                pending_patterns.append(pattern)
+                continue
+
+            self._flush(pending_indexes, pending_patterns)
+            pending_indexes, pending_patterns = [], []
+            stage = _SingleFilter(index, pattern)
+            if literal is None:
+                self._stages.append(stage)
+            else:
+                literals.append((literal, index))
+                self._literal_stages[index] = stage
+        self._flush(pending_indexes, pending_patterns)
+
+        self._literal_index = LiteralIndex(literals)
+        # Stages are identified by their highest priority category index in order to sort them with literal ones
+        self._stages_by_index = {stage.indexes[0]: stage for stage in self._stages}
+        self._stages_indexes = list(self._stages_by_index)
+        self._stages_by_index.update(self._literal_stages)
+
+        logger.debug(f'{len(self)} categories compiled into {len(self._stages)} patterns '
+                     f'and {len(self._literal_index)} literals')
+
+    def _flush(self, indexes: List[int], patterns: List[re.Pattern]):
+        if len(indexes) > 1:
+            try:
+                self._stages.append(_MergedFilters(indexes, patterns))
+                return
+            except re.error as e:
+                logger.warning(f'Unable to merge categories filters {indexes}: {e}')
+        self._stages.extend(_SingleFilter(index, pattern) for index, pattern in zip(indexes, patterns))
+
+    def __len__(self):
+        return len(self._literal_stages) + sum(len(stage.indexes) for stage in self._stages)
+
+    def match(self, symbol_name: str) -> Optional[int]:
+        """
+        Return the index of the first category matching the symbol name or None if no category matches.
+        """
+        if self.name_prefix:
+            symbol_name = self.name_prefix + symbol_name
+        hits = self._literal_index.search(symbol_name)
+        if hits:
+            stages_by_index = self._stages_by_index
+            hits.update(self._stages_indexes)
+            stages = (stages_by_index[index] for index in sorted(hits))
+        else:
+            stages = self._stages
+
+        evaluations = 0
+        for stage in stages:
+            evaluations += 1
+            index = stage.match(symbol_name)
+            if index is not None:
+                self.regex_evaluations += evaluations
+                return index
+        self.regex_evaluations += evaluations
+        return None
+
+    def find(self, symbol_name: str) -> Optional[Tuple[int, AlarmCategory]]:
+        """
+        Return the index and the alarm category of the first category matching the symbol name or None.
+        """
+        index = self.match(symbol_name)
+        if index is None:
+            return None
+        return index, self.categories[index].alarm_category
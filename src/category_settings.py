@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from alarm_category import AlarmCategory
 
 
@@ -6,5 +8,30 @@ class CategorySettings:
         self.name = name
         self.alarm_category = AlarmCategory(**kwargs)
 
+    @classmethod
+    def empty(cls, category_id: int) -> 'CategorySettings':
+        """
+        Return a category with no name and no filter, to be defined by the user
+        """
+        return cls(regex='', bg_color=(255, 255, 255), fg_color=(0, 0, 0), id=category_id)
+
+    def copy(self) -> 'CategorySettings':
+        alarm_category = self.alarm_category
+        return CategorySettings(name=self.name, regex=alarm_category.regex, bg_color=tuple(alarm_category.bg_color),
+                                fg_color=tuple(alarm_category.fg_color), id=alarm_category.id)
+
+    @property
+    def is_empty(self) -> bool:
+        # A category without filter never matches, its colors don't matter
+        return self.name == '' and self.alarm_category.regex == ''
+
     def __repr__(self):
         return f"CategorySettings({self.name}, {self.alarm_category})"
+
+
+def categories_by_slot(defined: Dict[int, CategorySettings]) -> List[CategorySettings]:
+    """
+    Return the defined categories at their slot in priority order, the slots left free being filled with empty
+    categories, so the id of every category is its position in the list
+    """
+    return [defined.get(slot) or CategorySettings.empty(slot) for slot in range(max(defined, default=-1) + 1)]
@@ -0,0 +1,233 @@
+"""
+Command line interface converting symbol files to EasyBuilder Pro alarms XLSX files without any UI.
+
+Example:
+    cli.py -p PLC_Line1 "line1/*.txt" -p PLC_Line2 line2/symbols.xml -o alarms/
+"""
+import argparse
+import configparser
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+# The script directory (src) is the only one added to the path when run as 'python src/cli.py', the repository
+# root is needed too by the modules importing the 'src' package
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from alarm_import import ImportSummary, ParseOptions, iter_file_alarms  # noqa: E402
+from import_source import ImportSource, supported_import_sources  # noqa: E402
+from profile_store import ProfileError  # noqa: E402
+from settings_manager import SettingsManager, categories_from_config  # noqa: E402
+from xls_write import XlsWriteOptions, write_xls_from_alarms  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+name_to_source = {src.name: src for src in supported_import_sources}
+
+
+@dataclass
+class ConversionJob:
+    symbols_filepath: Path
+    xlsx_filepath: Path
+    plc_name: str
+    import_source: ImportSource
+
+
+@dataclass
+class ConversionResult:
+    job: ConversionJob
+    summary: Optional[ImportSummary] = None
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+def guess_import_source(filepath: Path) -> ImportSource:
+    if filepath.suffix.lower() == '.xml':
+        return name_to_source['codesys']
+    return name_to_source['omron-sysmac']
+
+
+def expand_inputs(patterns: List[str]) -> List[List[Path]]:
+    """
+    Return the files matching each input pattern. A pattern which isn't a glob is kept as is.
+    """
+    files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            files.append([Path(f) for f in sorted(glob.glob(pattern, recursive=True))])
+        else:
+            files.append([Path(pattern)])
+    return files
+
+
+def convert(job: ConversionJob, categories_settings, xls_options: XlsWriteOptions) -> ConversionResult:
+    """
+    Convert a symbols file to an alarms XLSX file. Intended to be run in a worker process.
+    """
+    result = ConversionResult(job=job, summary=ImportSummary())
+    start = time.perf_counter()
+    try:
+        # Files are already converted concurrently, don't start another pool of processes for each of them
+        alarms = iter_file_alarms(job.import_source, job.symbols_filepath, categories_settings,
+                                  result.summary, ParseOptions(workers=1))
+        write_xls_from_alarms(str(job.xlsx_filepath), job.plc_name, alarms, categories_settings, xls_options)
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def jobs_count(value: str) -> int:
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"invalid number of jobs: '{value}' (0 for one per CPU)")
+    return count
+
+
+def alarms_count(value: str) -> int:
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"invalid number of alarms: '{value}'")
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Create XLSX files to import alarms in Weintek EasyBuilder Pro from PLC symbol files.",
+        epilog="Each PLC name applies to the input (file or glob pattern) at the same position. "
+               "A single PLC name applies to all the inputs.")
+    parser.add_argument('inputs', nargs='+', metavar='INPUT',
+                        help="Symbols file or glob pattern (e.g. 'exports/*.txt')")
+    parser.add_argument('-p', '--plc-name', action='append', required=True, dest='plc_names', metavar='NAME',
+                        help="PLC name used in EasyBuilder Pro")
+    parser.add_argument('-s', '--source', choices=sorted(name_to_source),
+                        help="Type of the symbol files (default: guessed from the file extension)")
+    parser.add_argument('-o', '--output-dir', type=Path,
+                        help="Directory of the XLSX files (default: next to each symbols file)")
+    parser.add_argument('-c', '--settings', type=Path,
+                        help="Settings file defining the categories, as exported from the application "
+                             "(default: the categories of the application profile)")
+    parser.add_argument('--profile',
+                        help="Application profile defining the categories (default: the selected profile)")
+    parser.add_argument('-j', '--jobs', type=jobs_count, default=0,
+                        help="Number of files converted concurrently (default: one per CPU)")
+    parser.add_argument('--engine', choices=('xlsxwriter', 'stream'), default='xlsxwriter',
+                        help="XLSX writer backend (default: %(default)s)")
+    parser.add_argument('--low-memory-threshold', type=alarms_count, default=XlsWriteOptions.low_memory_threshold,
+                        metavar='N',
+                        help="Write the rows to disk as soon as they are complete (xlsxwriter constant_memory mode, "
+                             "inline strings) for the workbooks of more than N alarms. The alarms are streamed "
+                             "from the symbol files, so any N above 0 enables it for every file "
+                             "(default: %(default)s, disabled)")
+    parser.add_argument('--tmpdir',
+                        help="Directory of the temporary files used while writing the workbooks")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_intermixed_args(argv)
+
+    if len(args.plc_names) not in (1, len(args.inputs)):
+        parser.error(f"{len(args.plc_names)} PLC names given for {len(args.inputs)} inputs")
+    if args.settings and not args.settings.is_file():
+        parser.error(f"Settings file not found: {args.settings}")
+    if args.settings and args.profile:
+        parser.error("--settings and --profile can't be used together")
+    return args
+
+
+def main(argv=None) -> int:
+    """
+    Run the conversions and return the exit code: 0 on success, 1 if any conversion failed, 2 on usage error.
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    if args.settings:
+        config = configparser.ConfigParser()
+        config.read(args.settings)
+        categories_settings = categories_from_config(config)
+    else:
+        settings = SettingsManager()
+        try:
+            # The profile selected in the application is left unchanged
+            categories_settings = settings.profiles.get_categories(args.profile or settings.current_profile)
+        except ProfileError as e:
+            print(e, file=sys.stderr)
+            return 2
+        finally:
+            settings.close()
+    # Alarms are streamed from the symbol files, the rows are still kept in memory until each workbook is closed
+    # unless the stream engine or the xlsxwriter low memory mode is used
+    xls_options = XlsWriteOptions(low_memory_threshold=args.low_memory_threshold, tmpdir=args.tmpdir,
+                                  engine=args.engine)
+
+    plc_names = args.plc_names * len(args.inputs) if len(args.plc_names) == 1 else args.plc_names
+    jobs = []
+    for pattern, files, plc_name in zip(args.inputs, expand_inputs(args.inputs), plc_names):
+        if not files:
+            print(f"No file matching '{pattern}'", file=sys.stderr)
+            return 2
+        for symbols_filepath in files:
+            output_dir = args.output_dir or symbols_filepath.parent
+            import_source = name_to_source[args.source] if args.source else guess_import_source(symbols_filepath)
+            jobs.append(ConversionJob(symbols_filepath=symbols_filepath,
+                                      xlsx_filepath=output_dir / symbols_filepath.with_suffix('.xlsx').name,
+                                      plc_name=plc_name,
+                                      import_source=import_source))
+    # A file written by several conversions would only keep the alarms of the last one completed
+    jobs_by_output = {}
+    for job in jobs:
+        jobs_by_output.setdefault(os.path.normcase(job.xlsx_filepath.resolve()), []).append(job)
+    collisions = [same_output_jobs for same_output_jobs in jobs_by_output.values() if len(same_output_jobs) > 1]
+    for same_output_jobs in collisions:
+        inputs = ', '.join(str(job.symbols_filepath) for job in same_output_jobs)
+        print(f"{inputs} would all be converted to {same_output_jobs[0].xlsx_filepath}", file=sys.stderr)
+    if collisions:
+        return 2
+    if args.output_dir:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as executor:
+        futures = {executor.submit(convert, job, categories_settings, xls_options): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # Every conversion not done yet fails the same way
+                result = ConversionResult(job=futures[future],
+                                          error="the conversion process ended abruptly (e.g. out of memory)")
+            job = result.job
+            if result.error:
+                failures += 1
+                print(f"FAILED {job.symbols_filepath}: {result.error} ({result.duration:.2f}s)", file=sys.stderr)
+            else:
+                print(f"{job.symbols_filepath} -> {job.xlsx_filepath}: "
+                      f"{result.summary.alarms} alarms / {result.summary.symbols} symbols "
+                      f"({result.duration:.2f}s)")
+                if result.summary.malformed:
+                    print(f"{job.symbols_filepath}: {result.summary.malformed}", file=sys.stderr)
+
+    print(f"{len(jobs) - failures}/{len(jobs)} files converted in {time.perf_counter() - start:.2f}s")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import logging
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from progress import UPDATE_EVERY, ProgressReporter
+from symbol import Symbol
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SymbolType:
+    """
+    Type definition read from the TypeList of a CODESYS symbol configuration file.
+    """
+    name: str
+    iec_name: str
+    # Structured types: (element name, element type name, element comment)
+    elements: List[Tuple[str, str, str]] = field(default_factory=list)
+    # Array types: base type name and (min, max) ranges of each dimension
+    base_type: Optional[str] = None
+    dimensions: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def _local_name(tag: str) -> str:
+    # Drop the '{namespace}' prefix added by ElementTree
+    return tag.rpartition('}')[2]
+
+
+def _comment(elem: ET.Element) -> str:
+    comment = elem.get('comment')
+    if comment is not None:
+        return comment
+    for child in elem:
+        if _local_name(child.tag) == 'Comment':
+            return child.text or ''
+    return ''
+
+
+def _read_type(elem: ET.Element, tag: str) -> SymbolType:
+    symbol_type = SymbolType(name=elem.get('name', ''), iec_name=elem.get('iecname', ''))
+    if tag == 'TypeUserDef':
+        for child in elem:
+            if _local_name(child.tag) == 'UserDefElement':
+                symbol_type.elements.append((child.get('iecname', ''), child.get('type', ''), _comment(child)))
+    elif tag == 'TypeArray':
+        symbol_type.base_type = elem.get('basetype')
+        for child in elem:
+            if _local_name(child.tag) == 'ArrayDim':
+                symbol_type.dimensions.append((int(child.get('minrange', 0)), int(child.get('maxrange', -1))))
+    return symbol_type
+
+
+def _array_indexes(dimensions: List[Tuple[int, int]]) -> Iterator[str]:
+    if not dimensions:
+        yield ''
+        return
+    (first, last), others = dimensions[0], dimensions[1:]
+    for i in range(first, last + 1):
+        for index in _array_indexes(others):
+            yield f'{i},{index}' if index else str(i)
+
+
+def expand_symbol(path: str, type_name: str, comment: str, types: Dict[str, SymbolType]) -> Iterator[Symbol]:
+    """
+    Yield the symbols of every leaf of a variable, expanding structured types into dotted paths
+    and arrays into indexed paths.
+    """
+    symbol_type = types.get(type_name)
+    if symbol_type is None:
+        yield Symbol(name=path, type=type_name, comment=comment)
+    elif symbol_type.elements:
+        for element_name, element_type, element_comment in symbol_type.elements:
+            yield from expand_symbol(f'{path}.{element_name}', element_type, element_comment or comment, types)
+    elif symbol_type.dimensions and symbol_type.base_type:
+        for index in _array_indexes(symbol_type.dimensions):
+            yield from expand_symbol(f'{path}[{index}]', symbol_type.base_type, comment, types)
+    else:
+        yield Symbol(name=path, type=symbol_type.iec_name or type_name, comment=comment)
+
+
+class _TimedFile:
+    """
+    Binary file adding the time spent reading it to timings['read']
+    """
+    def __init__(self, f: BinaryIO, timings: Counter):
+        self._f = f
+        self._timings = timings
+
+    def read(self, size: int = -1) -> bytes:
+        start = time.perf_counter()
+        data = self._f.read(size)
+        self._timings['read'] += time.perf_counter() - start
+        return data
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+
+def iter_codesys_symbols(filepath, progress: ProgressReporter = None, timings: Counter = None) -> Iterator[Symbol]:
+    """
+    Read a CODESYS symbol configuration XML file and yield its symbols as soon as their node is parsed.
+
+    The file is parsed incrementally and every processed element is released, so the memory used doesn't depend
+    on the file size. The TypeList section is kept as it is needed to expand structured variables.
+    The progress, if given, is updated with the bytes read, and the time spent reading the file is added to
+    timings['read'].
+    """
+    types: Dict[str, SymbolType] = {}
+    with open(filepath, 'rb') as f:
+        yield from _iter_symbols(f if timings is None else _TimedFile(f, timings), types, progress)
+    logger.debug(f'{len(types)} types read from {filepath}')
+
+
+def _iter_symbols(f: BinaryIO, types: Dict[str, SymbolType], progress: ProgressReporter = None) -> Iterator[Symbol]:
+    elements = []   # Currently opened elements
+    node_path = []  # Names of the currently opened Node elements
+
+    for events_count, (event, elem) in enumerate(ET.iterparse(f, events=('start', 'end'))):
+        if progress is not None and events_count % UPDATE_EVERY == 0:
+            progress.update(bytes_read=f.tell())
+        tag = _local_name(elem.tag)
+        if event == 'start':
+            elements.append(elem)
+            if tag == 'Node':
+                node_path.append(elem.get('name', ''))
+            continue
+
+        elements.pop()
+        if tag == 'Node':
+            type_name = elem.get('type')
+            if type_name is not None:
+                yield from expand_symbol('.'.join(node_path), type_name, _comment(elem), types)
+            node_path.pop()
+        elif tag.startswith('Type') and tag != 'TypeList':
+            symbol_type = _read_type(elem, tag)
+            types[symbol_type.name] = symbol_type
+        elif elements:
+            # Children of Node and Type elements are read with their parent
+            continue
+
+        elem.clear()
+        if elements:
+            elements[-1].remove(elem)
@@ -5,3 +5,12 @@ from dataclasses import dataclass
 class ImportSource:
     name: str
     full_name: str
+    # Added in front of the symbol names to get their address in EasyBuilder Pro. The symbols are kept without it,
+    # it is added when the names are matched against the category filters and when the alarms are written.
+    address_prefix: str = ''
+
+
+supported_import_sources = [
+    ImportSource('codesys', 'CODESYS XML symbols'),
+    ImportSource('omron-sysmac', 'OMRON Sysmac Studio', address_prefix='VAR://')
+]
@@ -0,0 +1,106 @@
+import re
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python >= 3.11
+except ImportError:
+    import sre_parse
+
+
+# Literals shorter than this would be found in almost every symbol name and wouldn't filter anything
+MIN_LITERAL_LENGTH = 2
+
+_REPEAT_OPCODES = tuple(getattr(sre_parse, name)
+                        for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                        if hasattr(sre_parse, name))
+
+
+def _literal_runs(items, runs: List[str]):
+    """
+    Append to runs every contiguous literal string the parsed items must contain for a match to exist.
+    """
+    current = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+        if op is sre_parse.AT:
+            # Anchors don't consume characters, the literal run goes on
+            continue
+
+        runs.append(''.join(current))
+        current = []
+
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, _, sub_items = av
+            if not add_flags & re.IGNORECASE:
+                _literal_runs(sub_items, runs)
+        elif op in _REPEAT_OPCODES:
+            min_repeat, _, sub_items = av
+            if min_repeat >= 1:
+                _literal_runs(sub_items, runs)
+    runs.append(''.join(current))
+
+
+def extract_required_literal(pattern: re.Pattern) -> Optional[str]:
+    """
+    Return the longest literal string any symbol name matching the pattern contains, or None if there is no usable one.
+
+    Only literals which are mandatory for the whole pattern are considered: alternatives, optional parts and case
+    insensitive parts are skipped.
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+
+    runs = []
+    _literal_runs(parsed, runs)
+    literal = max(runs, key=len, default='')
+    return literal if len(literal) >= MIN_LITERAL_LENGTH else None
+
+
+class LiteralIndex:
+    """
+    Multi-pattern substring index which tells which literals appear in a text using a single scan.
+
+    The literals are compiled into one pattern looking ahead for the longest literal starting at every position.
+    Any other literal starting at the same position is a prefix of the found one, so every literal appearing in the
+    text is a substring of a found literal: the values of those substrings are precomputed for each literal.
+    """
+    def __init__(self, literals: Iterable[Tuple[str, Hashable]]):
+        values_by_literal: Dict[str, Set[Hashable]] = defaultdict(set)
+        for literal, value in literals:
+            values_by_literal[literal].add(value)
+
+        self._values: Dict[str, frozenset] = {}
+        for literal in values_by_literal:
+            self._values[literal] = frozenset(
+                value
+                for other, values in values_by_literal.items() if other in literal
+                for value in values
+            )
+
+        self._scanner = None
+        if values_by_literal:
+            alternatives = '|'.join(re.escape(lit) for lit in sorted(values_by_literal, key=len, reverse=True))
+            self._scanner = re.compile(f'(?=({alternatives}))')
+
+    def __len__(self):
+        return len(self._values)
+
+    def search(self, text: str) -> Set[Hashable]:
+        """
+        Return the values of all the literals found in the text.
+        """
+        found = set()
+        if self._scanner is None:
+            return found
+        for literal in set(self._scanner.findall(text)):
+            found |= self._values[literal]
+        return found
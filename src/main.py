@@ -1,28 +1,34 @@
-import json
+# Imported first, to take the time spent importing the other modules into account
+from startup_timer import log_time_to_first_window
+
 import logging
+import logging.handlers
+import multiprocessing
 import queue
+import sys
 import tkinter as tk
 from pathlib import Path
+from platformdirs import user_log_dir
 from tkinter import messagebox
+from tkinter import simpledialog
 from tkinter import ttk
 from tkinter.filedialog import askopenfilename, asksaveasfilename
 
 from src import __version__, APP_NAME
-from category_settings import CategorySettings
-from import_source import ImportSource
+from import_source import supported_import_sources
+from profile_store import ProfileError
 from settings_manager import SettingsManager
 from ui import CategoriesSettingsDialog
+from ui import NotifyingQueue
 from ui import StatusBar
-from ui import WorkerThread
+from ui import TaskExecutor
 
 
 logger = logging.getLogger(__name__)
 
+# Size above which the log file is rotated, the previous one being kept
+LOG_FILE_MAX_SIZE = 1024 * 1024
 
-supported_import_sources = [
-    ImportSource('codesys', 'CODESYS XML symbols'),
-    ImportSource('omron-sysmac', 'OMRON Sysmac Studio')
-]
 # mapping full_name -> ImportSource used to get ImportSource objet from ComboBox selection
 full_name_to_source = {src.full_name: src for src in supported_import_sources}
 
@@ -32,18 +38,25 @@ class AppUi(tk.Tk):
         super(AppUi, self).__init__()
 
         self.alarms = []
+        # Symbols of the last parsed file, kept to update the alarms when the categories change
+        self.symbol_table = None
         self.import_filepath = None
 
-        # Queues
-        self.task_queue = queue.Queue()
-        self.result_queue = queue.Queue()
+        # Results are handled as soon as they are put, by the <<WorkerResult>> binding
+        self.result_queue = NotifyingQueue(self, '<<WorkerResult>>')
 
-        # Worker to handle time-consuming tasks in order to keep the UI responsive
-        self.worker = WorkerThread(self.task_queue, self.result_queue)
-        self.worker.start()
+        # Executor to run time-consuming tasks in order to keep the UI responsive
+        self.executor = TaskExecutor(self.result_queue)
+        # Result handler of the tasks not done yet, by task id
+        self.result_handlers = {}
+        # Stats of the tasks done, by task id, kept until their result is handled
+        self.task_stats = {}
+        # Id of the last task updating the alarms, the results of the previous ones are outdated
+        self.alarms_task_id = None
 
         self.settings = SettingsManager()
         self.categories_settings = None
+        self.selected_profile = tk.StringVar()
 
         self.title(f"EasyBuilder Alarms Import - V{__version__}")
         self.minsize(400, 150)
@@ -74,6 +87,13 @@ class AppUi(tk.Tk):
         self.categories_button = tk.Button(frame, text="Define", command=self.open_categories_settings)
         self.categories_button.grid(row=2, column=1, sticky="W")
 
+        # Streaming mode
+        self.stream_mode = tk.BooleanVar()
+        stream_mode_checkbutton = ttk.Checkbutton(frame,
+                                                  text="Write alarms directly to XLSX (large files)",
+                                                  variable=self.stream_mode)
+        stream_mode_checkbutton.grid(row=3, column=0, columnspan=2, pady=5)
+
         frame.pack()
 
         buttons_frame = ttk.Frame(self.main_frm)
@@ -87,6 +107,11 @@ class AppUi(tk.Tk):
         self.save_button.grid(row=0, column=1, padx=20)
         self.save_button["state"] = "disabled"
 
+        # Cancel button, enabled while some tasks are running
+        self.cancel_button = tk.Button(buttons_frame, text='Cancel', command=self.on_click_cancel_button)
+        self.cancel_button.grid(row=0, column=2)
+        self.cancel_button["state"] = "disabled"
+
         buttons_frame.pack(pady=10)
 
         self.status_bar = StatusBar(self.main_frm)
@@ -95,28 +120,71 @@ class AppUi(tk.Tk):
 
         self.main_frm.pack(fill=tk.BOTH, expand=True)
 
-        # Check worker thread results (Called repeatedly)
-        self.__check_result_queue()
+        # Handle worker thread results
+        self.bind('<<WorkerResult>>', self.on_worker_result)
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-    def __check_result_queue(self):
+    def on_worker_result(self, event=None):
         try:
             while True:
-                message, data = self.result_queue.get_nowait()
-                if message == 'parse_result':
-                    self.alarms = data
-                    nb_alarms = len(self.alarms)
-                    if nb_alarms:
-                        self.save_button["state"] = "normal"
-                    self.status_bar.set_text(f'{nb_alarms} alarms found.')
-                elif message == 'write_xls_success':
-                    self.status_bar.set_text(f'Alarms saved to {data}')
+                task_id, message, data = self.result_queue.get_nowait()
+                if message == 'progress':
+                    self.status_bar.set_progress(data)
+                    continue
+                if message == 'stats':
+                    # Sent right before the result of the task
+                    self.task_stats[task_id] = data
+                    continue
+
+                # Any other message ends the task, its result is handled by the code which submitted it
+                handler = self.result_handlers.pop(task_id, None)
+                if not self.result_handlers:
+                    self.cancel_button["state"] = "disabled"
+                    self.status_bar.hide_progress()
+                if message == 'cancelled':
+                    self.status_bar.set_text('Cancelled.')
+                elif message == 'error':
+                    self.status_bar.set_text(f'Failed: {data}')
+                elif handler is not None:
+                    handler(task_id, message, data)
+                self.task_stats.pop(task_id, None)
 
         except queue.Empty:
             pass
-        # Schedule another call after 100ms
-        self.after(100, self.__check_result_queue)
+
+    def on_alarms_result(self, task_id, message, data):
+        if task_id != self.alarms_task_id:
+            logger.debug(f'Outdated {message} of task {task_id} ignored')
+            return
+        self.symbol_table, self.alarms, summary = data
+        nb_alarms = len(self.alarms)
+        self.save_button["state"] = "normal" if nb_alarms else "disabled"
+        self.status_bar.set_text(f'{nb_alarms} alarms found.{self._malformed_lines_text(summary)}'
+                                 f'{self._stats_text(task_id)}')
+        # The categories may have changed while the task was running
+        self.update_alarms_categories()
+
+    def on_write_xls_result(self, task_id, message, data):
+        if message == 'write_xls_success':
+            self.status_bar.set_text(f'Alarms saved to {data}.{self._stats_text(task_id)}')
+        elif message == 'stream_xls_success':
+            xlsx_filepath, summary = data
+            self.status_bar.set_text(f'{summary.alarms} alarms (out of {summary.symbols} symbols) '
+                                     f'saved to {xlsx_filepath}.{self._malformed_lines_text(summary)}'
+                                     f'{self._stats_text(task_id)}')
+
+    @staticmethod
+    def _malformed_lines_text(summary):
+        if summary is None or not summary.malformed:
+            return ''
+        return f' {summary.malformed.count} malformed lines skipped (see the log).'
+
+    def _stats_text(self, task_id):
+        stats = self.task_stats.get(task_id)
+        if stats is None:
+            return ''
+        return f' ({stats.short_text()})'
 
     def add_menu_bar(self):
         menu_bar = tk.Menu(self)
@@ -128,12 +196,56 @@ class AppUi(tk.Tk):
         menu_file.add_command(label="Exit", command=self.on_closing)
         menu_bar.add_cascade(label="File", menu=menu_file)
 
+        # Profiles entries are listed each time the menu is opened
+        self.menu_profile = tk.Menu(menu_bar, tearoff=0, postcommand=self.update_profile_menu)
+        menu_bar.add_cascade(label="Profile", menu=self.menu_profile)
+
         menu_help = tk.Menu(menu_bar, tearoff=0)
         menu_help.add_command(label="About", command=self.do_about)
         menu_bar.add_cascade(label="Help", menu=menu_help)
 
         self.config(menu=menu_bar)
 
+    def update_profile_menu(self):
+        self.menu_profile.delete(0, 'end')
+        self.selected_profile.set(self.settings.current_profile)
+        for name in self.settings.list_profiles():
+            self.menu_profile.add_radiobutton(label=name, value=name, variable=self.selected_profile,
+                                              command=lambda n=name: self.do_select_profile(n))
+        self.menu_profile.add_separator()
+        self.menu_profile.add_command(label="New profile...", command=self.do_new_profile)
+        self.menu_profile.add_command(label="Delete profile", command=self.do_delete_profile)
+
+    def do_select_profile(self, name):
+        self.settings.select_profile(name)
+        self.load_from_settings()
+        self.status_bar.set_text(f'Profile "{name}" loaded.')
+        self.update_alarms_categories()
+
+    def do_new_profile(self):
+        name = simpledialog.askstring("New profile", "Name of the new profile (copy of the current one):",
+                                      parent=self)
+        if not name:
+            return
+        try:
+            self.settings.create_profile(name)
+        except ProfileError as e:
+            messagebox.showerror("Profile not created", str(e))
+            return
+        self.do_select_profile(name)
+
+    def do_delete_profile(self):
+        name = self.settings.current_profile
+        if not messagebox.askyesno("Delete profile", f'Delete the profile "{name}" and its categories?',
+                                   default="no"):
+            return
+        try:
+            self.settings.delete_profile(name)
+        except ProfileError as e:
+            messagebox.showerror("Profile not deleted", str(e))
+            return
+        self.do_select_profile(self.settings.current_profile)
+
     def do_about(self):
         desc = "This application allows you to create a XLSX file to import alarms in Weintek (KEP) EasyBuilder Pro."
         content = (f"{APP_NAME}\n"
@@ -153,6 +265,7 @@ class AppUi(tk.Tk):
         if import_filepath:
             self.settings.import_from(import_filepath)
             self.load_from_settings()
+            self.update_alarms_categories()
 
     def do_export_settings(self):
         asksavefile_title = "Please choose a filename to save the settings on"
@@ -167,8 +280,9 @@ class AppUi(tk.Tk):
         """
         This method is called when closing the application
         """
-        self.task_queue.put(("stop", None))
-        self.settings.save()
+        self.executor.shutdown()
+        # Only writes the settings if some changes are still pending
+        self.settings.close()
         self.destroy()
 
     def on_click_import_button(self):
@@ -177,7 +291,7 @@ class AppUi(tk.Tk):
         """
         selected_full_name  = self.src_type_combobox.get()
         if selected_full_name == '':
-            self.settings.set('general', 'import_source', '')
+            self.settings.set_profile_value('import_source', '')
             messagebox.showerror(
                 "No source type selected",
                 "You first need to select the source type of the symbols you are importing."
@@ -185,7 +299,7 @@ class AppUi(tk.Tk):
             return
 
         selected_source = full_name_to_source[selected_full_name]
-        self.settings.set('general', 'import_source', selected_source.name)
+        self.settings.set_profile_value('import_source', selected_source.name)
 
         # Define title and filter file types according to the selected import source
         if selected_source.name == 'codesys':
@@ -206,41 +320,81 @@ class AppUi(tk.Tk):
                                  "No file was selected. Aborted.")
             return
 
-        # Delegate the parsing to the worker thread
+        if self.stream_mode.get():
+            # Parse and write the alarms in a single pass without keeping them in memory
+            plc_name = self._get_plc_name()
+            xlsx_out_filepath = self._ask_xlsx_filepath() if plc_name else None
+            if xlsx_out_filepath:
+                self.alarms = []
+                self.symbol_table = None
+                # The alarms of the parsing tasks still running are no longer wanted
+                self.alarms_task_id = None
+                self.save_button["state"] = "disabled"
+                command = 'stream_xls'
+                cmd_args = (selected_source, self.import_filepath, self.categories_settings,
+                            plc_name, xlsx_out_filepath, self.get_parse_options(), self.get_xls_write_options())
+                self.run_task(command, cmd_args, self.on_write_xls_result)
+            return
+
+        # Delegate the parsing to the executor, it may run while the alarms of the previous file are written
         command = 'parse'
-        cmd_args = (selected_source, self.import_filepath, self.categories_settings)
-        task = (command, cmd_args)
-        self.task_queue.put(task)
+        cmd_args = (selected_source, self.import_filepath, self.categories_settings, self.get_parse_options())
+        self.alarms_task_id = self.run_task(command, cmd_args, self.on_alarms_result).id
 
-    def on_click_save_button(self):
+    def run_task(self, command, cmd_args, on_result):
+        """
+        Delegate a task to the executor and return its handle, it can be cancelled until its result is received.
+        on_result(task_id, message, data) is called with the result of the task, unless it is cancelled or fails.
+        """
+        task = self.executor.submit(command, cmd_args)
+        self.result_handlers[task.id] = on_result
+        self.cancel_button["state"] = "normal"
+        return task
+
+    def on_click_cancel_button(self):
+        self.executor.cancel_all()
+        self.status_bar.set_text('Cancelling...')
+
+    def _get_plc_name(self):
+        """
+        Return the PLC name entered by the user or None after reporting it is missing
+        """
         plc_name = self.plc_name_entry_text.get()
         if plc_name:
-            self.settings.set('general', 'plc_name', plc_name)
-        else:
-            messagebox.showerror("PLC name is missing",
-                                 "Please enter a PLC name value")
-            return
+            self.settings.set_profile_value('plc_name', plc_name)
+            return plc_name
+
+        messagebox.showerror("PLC name is missing",
+                             "Please enter a PLC name value")
+        return None
 
+    def _ask_xlsx_filepath(self):
         xlsx_out_filename = Path(self.import_filepath).with_suffix('.xlsx')
         asksavefile_title = "Please choose a filename to save the alarms on"
         asksavefile_filetypes = [('XLSX files', '.xlsx')]
         asksavefile_filetypes.extend([('All files', '.*')])
-        xlsx_out_filepath = asksaveasfilename(title=asksavefile_title,
-                                              initialdir=xlsx_out_filename.parent,
-                                              initialfile=xlsx_out_filename.stem,
-                                              filetypes=asksavefile_filetypes,
-                                              defaultextension='.xlsx')
+        return asksaveasfilename(title=asksavefile_title,
+                                 initialdir=xlsx_out_filename.parent,
+                                 initialfile=xlsx_out_filename.stem,
+                                 filetypes=asksavefile_filetypes,
+                                 defaultextension='.xlsx')
+
+    def on_click_save_button(self):
+        plc_name = self._get_plc_name()
+        if not plc_name:
+            return
+
+        xlsx_out_filepath = self._ask_xlsx_filepath()
         if xlsx_out_filepath:
             command = 'write_xls'
-            cmd_args = (self.alarms, plc_name, xlsx_out_filepath, self.categories_settings)
-            task = (command, cmd_args)
-            self.task_queue.put(task)
+            cmd_args = (self.alarms, plc_name, xlsx_out_filepath, self.categories_settings, self.get_xls_write_options())
+            self.run_task(command, cmd_args, self.on_write_xls_result)
 
     def _select_last_import_source_used(self):
         """
         Select the last used import source from the settings on the ComboBox widget
         """
-        import_source_setting = self.settings.get('general', 'import_source')
+        import_source_setting = self.settings.get_profile_value('import_source')
         if import_source_setting != '':
             name_to_source = {src.name: src for src in supported_import_sources}
             import_source = name_to_source.get(import_source_setting)
@@ -249,40 +403,90 @@ class AppUi(tk.Tk):
 
     def load_from_settings(self):
         self._select_last_import_source_used()
-        self.plc_name_entry_text.set(self.settings.get('general', 'plc_name', ''))
+        self.plc_name_entry_text.set(self.settings.get_profile_value('plc_name'))
         self.categories_settings = self.get_categories_settings()
 
     def get_categories_settings(self):
-        categories_settings = []
-        for category_id in range(256):
-            category_settings = self.settings.get('Categories', str(category_id), None)
-            if not category_settings:
-                category_settings = json.dumps({
-                    'name': '',
-                    'filter': '',
-                    'bg_color': [255, 255, 255],
-                    'fg_color': [0, 0, 0]
-                })
-            settings_json = json.loads(category_settings)
-            categories_settings.append(
-                CategorySettings(
-                    name=settings_json['name'],
-                    regex=settings_json['filter'],
-                    bg_color=settings_json['bg_color'],
-                    fg_color=settings_json['fg_color'],
-                )
-            )
-        return categories_settings
+        return self.settings.get_categories_settings()
+
+    def get_parse_options(self):
+        # Imported on first use as the parsing modules aren't needed to show the window
+        from alarm_import import ParseOptions
+
+        default_options = ParseOptions()
+        workers = self.settings.get('parsing', 'workers', str(default_options.workers))
+        threshold_mb = self.settings.get('parsing', 'parallel_threshold_mb',
+                                         str(default_options.parallel_threshold // (1024 * 1024)))
+        use_cache = self.settings.get('cache', 'enabled', 'yes')
+        cache_max_size_mb = self.settings.get('cache', 'max_size_mb',
+                                              str(default_options.cache_max_size // (1024 * 1024)))
+        try:
+            return ParseOptions(workers=int(workers),
+                                parallel_threshold=int(threshold_mb) * 1024 * 1024,
+                                use_cache=use_cache.lower() in ('yes', 'true', 'on', '1'),
+                                cache_max_size=int(cache_max_size_mb) * 1024 * 1024)
+        except ValueError:
+            logger.warning(f'Invalid parsing settings, using default values: {default_options}')
+            return default_options
+
+    def get_xls_write_options(self):
+        # Imported on first use as loading xlsxwriter takes a while
+        from xls_write import XlsWriteOptions
+
+        default_options = XlsWriteOptions()
+        threshold = self.settings.get('xlsx', 'low_memory_threshold', str(default_options.low_memory_threshold))
+        tmpdir = self.settings.get('xlsx', 'tmpdir', '') or None
+        engine = self.settings.get('xlsx', 'engine', default_options.engine)
+        try:
+            return XlsWriteOptions(low_memory_threshold=int(threshold), tmpdir=tmpdir, engine=engine)
+        except ValueError:
+            logger.warning(f'Invalid XLSX settings, using default values: {default_options}')
+            return default_options
 
     def open_categories_settings(self):
         popup = CategoriesSettingsDialog(self,
                                          categories_settings=self.categories_settings,
-                                         settings_manager=self.settings)
+                                         settings_manager=self.settings,
+                                         symbol_names=self.symbol_table.names if self.symbol_table else None,
+                                         name_prefix=self.symbol_table.name_prefix if self.symbol_table else '')
         popup.wait_window()
         self.categories_settings = popup.categories_settings
+        self.update_alarms_categories()
+
+    def update_alarms_categories(self):
+        """
+        Categorize the last parsed symbols again if the categories filters changed
+        """
+        if self.alarms_task_id in self.result_handlers:
+            # The alarms are updated again if needed once the running parsing or categorization is done
+            return
+        # Only the symbols possibly affected by the changed filters are categorized again
+        symbol_table = self.symbol_table
+        if symbol_table is not None and symbol_table.first_changed_category(self.categories_settings) is not None:
+            self.status_bar.set_text('Updating alarms categories...')
+            task = self.run_task('recategorize', (symbol_table, self.categories_settings), self.on_alarms_result)
+            self.alarms_task_id = task.id
+
+
+def setup_logging():
+    """
+    Log to a file of the user log directory, and to the console if any: the executables have no console.
+    """
+    log_file = Path(user_log_dir(APP_NAME)) / f'{APP_NAME}.log'
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    handlers = [logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_SIZE, backupCount=1,
+                                                     encoding='utf-8')]
+    if sys.stderr is not None:
+        handlers.append(logging.StreamHandler())
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(threadName)s %(name)s: %(message)s',
+                        handlers=handlers)
 
 
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO)
+    # Required by the parallel parsing processes in the frozen executable
+    multiprocessing.freeze_support()
+    # The stats of each task are logged at the INFO level. Set EB_ALARMS_PROFILE_DIR to profile the tasks too.
+    setup_logging()
     main_app = AppUi()
+    log_time_to_first_window(main_app)
     main_app.mainloop()
@@ -0,0 +1,107 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from category_set import CategorySet
+from category_settings import CategorySettings
+from sysmac_symbols import MalformedLines, detect_encoding, iter_symbol_lines
+
+
+logger = logging.getLogger(__name__)
+
+# Chunks smaller than this aren't worth the inter-process communication overhead
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+# More chunks than workers keep every worker busy even if some chunks have more matches than others
+CHUNKS_PER_WORKER = 4
+
+# Category set of the worker process, built once by the pool initializer
+_category_set: Optional[CategorySet] = None
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def split_file(filepath, chunk_count: int) -> List[Tuple[int, int]]:
+    """
+    Split a file in up to chunk_count byte ranges (start, end) ending right after a newline.
+    """
+    size = os.path.getsize(filepath)
+    chunk_size = max(size // max(chunk_count, 1), 1)
+    ranges = []
+    with open(filepath, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()  # Move to the end of the current line
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _init_worker(categories: List[CategorySettings], name_prefix: str):
+    global _category_set
+    _category_set = CategorySet(categories, name_prefix=name_prefix)
+
+
+def _parse_chunk(args) -> Tuple[int, int, List[Tuple[str, str, str, Optional[int]]], MalformedLines, int]:
+    """
+    Parse the lines of a byte range of a Sysmac Studio symbols file.
+
+    Return the number of lines and symbols read, the (name, type, raw comment, category index) of the matching
+    symbols, or of all the symbols (with a None index when not matching) if all_symbols is set, the malformed
+    lines skipped (numbered from the start of the chunk) and the number of category filter patterns searched.
+    """
+    filepath, start, end, encoding, all_symbols = args
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    match = _category_set.match
+    regex_evaluations = _category_set.regex_evaluations
+    matches = []
+    malformed = MalformedLines()
+    symbols_count = 0
+    lines = data.decode(encoding).split('\n')
+    if lines[-1] == '':
+        # Nothing follows the last newline
+        lines.pop()
+    for name, symbol_type, comment in iter_symbol_lines(lines, malformed):
+        symbols_count += 1
+        index = match(name)
+        if index is not None or all_symbols:
+            matches.append((name, symbol_type, comment, index))
+    return len(lines), symbols_count, matches, malformed, _category_set.regex_evaluations - regex_evaluations
+
+
+def iter_sysmac_matches_parallel(symbols_filepath, categories: List[CategorySettings], workers: int = 0,
+                                 all_symbols: bool = False, encoding: str = None, name_prefix: str = ''
+                                 ) -> Iterator[Tuple[int, int, int, List[Tuple[str, str, str, Optional[int]]],
+                                                     MalformedLines, int]]:
+    """
+    Parse a Sysmac Studio symbols file using a pool of processes.
+
+    The results of each chunk are yielded in the file order with the offset of the end of the chunk:
+    (end, lines count, symbols count, matches, malformed lines, regex evaluations) as returned by _parse_chunk.
+    The file encoding, detected if not given, must allow to split it on newline bytes (see is_byte_splittable()).
+    The symbol names are matched with name_prefix added in front, the names yielded don't have it.
+    """
+    workers = workers or default_workers()
+    chunk_count = min(workers * CHUNKS_PER_WORKER, os.path.getsize(symbols_filepath) // MIN_CHUNK_SIZE + 1)
+    # A UTF-8 BOM is only found at the start of the first chunk, utf-8-sig decodes the other chunks as UTF-8
+    if encoding is None:
+        encoding = detect_encoding(symbols_filepath)
+    tasks = [(symbols_filepath, start, end, encoding, all_symbols)
+             for start, end in split_file(symbols_filepath, chunk_count)]
+    logger.info(f'Parsing {symbols_filepath} in {len(tasks)} chunks using {workers} processes')
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(categories, name_prefix))
+    try:
+        # map() yields the results in the order of the tasks, whatever the order they complete
+        for task, result in zip(tasks, executor.map(_parse_chunk, tasks)):
+            yield (task[2], *result)
+    finally:
+        # Don't parse the remaining chunks if the results are no longer consumed (e.g. cancelled task)
+        executor.shutdown(cancel_futures=True)
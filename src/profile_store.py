@@ -0,0 +1,175 @@
+import json
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from category_settings import CategorySettings, categories_by_slot
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    plc_name TEXT NOT NULL DEFAULT '',
+    import_source TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS categories (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    filter TEXT NOT NULL,
+    bg_color TEXT NOT NULL,
+    fg_color TEXT NOT NULL,
+    PRIMARY KEY (profile_id, position)
+) WITHOUT ROWID;
+"""
+
+
+class ProfileError(Exception):
+    pass
+
+
+@dataclass
+class Profile:
+    name: str
+    plc_name: str = ''
+    import_source: str = ''
+
+
+class ProfileStore:
+    """
+    Named settings profiles (e.g. one by machine) stored in a single SQLite database.
+
+    Each profile holds its own categories, PLC name and last import source. Categories are keyed by profile and
+    priority, so the categories of a profile are read without reading the other profiles and listing the profiles
+    doesn't read any category.
+
+    The store may be used from several threads (e.g. written by the settings flush thread), one at a time.
+    """
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        # Serializes the uses of the connection
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def list_profiles(self) -> List[str]:
+        with self._lock:
+            return [name for name, in self.connection.execute('SELECT name FROM profiles ORDER BY name')]
+
+    def _profile_id(self, name: str) -> int:
+        row = self.connection.execute('SELECT id FROM profiles WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise ProfileError(f'Unknown profile "{name}"')
+        return row[0]
+
+    def get_profile(self, name: str) -> Optional[Profile]:
+        with self._lock:
+            row = self.connection.execute('SELECT name, plc_name, import_source FROM profiles WHERE name = ?',
+                                          (name,)).fetchone()
+        return Profile(*row) if row else None
+
+    def create_profile(self, name: str, copy_from: str = None) -> Profile:
+        """
+        Create a new profile, empty or as a copy of an existing one
+        """
+        source = self.get_profile(copy_from) if copy_from else Profile(name)
+        try:
+            with self._lock, self.connection:
+                cursor = self.connection.execute(
+                    'INSERT INTO profiles (name, plc_name, import_source) VALUES (?, ?, ?)',
+                    (name, source.plc_name, source.import_source))
+                if copy_from:
+                    self.connection.execute(
+                        'INSERT INTO categories SELECT ?, position, name, filter, bg_color, fg_color '
+                        'FROM categories WHERE profile_id = ?',
+                        (cursor.lastrowid, self._profile_id(copy_from)))
+        except sqlite3.IntegrityError:
+            raise ProfileError(f'Profile "{name}" already exists')
+        logger.info(f'Profile "{name}" created')
+        return Profile(name, source.plc_name, source.import_source)
+
+    def delete_profile(self, name: str):
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM profiles WHERE id = ?', (self._profile_id(name),))
+        logger.info(f'Profile "{name}" deleted')
+
+    def update_profile(self, name: str, **values):
+        """
+        Update the plc_name and/or import_source of a profile
+        """
+        self.save_profile(name, values=values)
+
+    def get_categories(self, name: str) -> List[CategorySettings]:
+        """
+        Return the categories of a profile in priority order, their ids being their positions in the list.
+
+        Only the defined categories are stored, each one at its slot: the free slots are returned as empty categories
+        so the categories keep their ids when a category of higher priority is emptied.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT position, name, filter, bg_color, fg_color FROM categories '
+                'WHERE profile_id = ? ORDER BY position', (self._profile_id(name),)).fetchall()
+        return categories_by_slot({
+            position: CategorySettings(name=category_name, regex=category_filter,
+                                       bg_color=json.loads(bg_color), fg_color=json.loads(fg_color), id=position)
+            for position, category_name, category_filter, bg_color, fg_color in rows
+        })
+
+    def set_categories(self, name: str, categories_settings: Dict[int, CategorySettings]):
+        """
+        Set the given categories of a profile, by category id, in a single transaction.
+        Empty categories are not stored.
+        """
+        self.save_profile(name, categories_settings=categories_settings)
+
+    def replace_categories(self, name: str, categories_settings: List[CategorySettings]):
+        """
+        Replace all the categories of a profile in a single transaction
+        """
+        self.save_profile(name, categories_settings={category.alarm_category.id: category
+                                                     for category in categories_settings},
+                          replace_categories=True)
+
+    def save_profile(self, name: str, values: Dict[str, str] = None,
+                     categories_settings: Dict[int, CategorySettings] = None, replace_categories: bool = False):
+        """
+        Update the values (plc_name and/or import_source) and set the given categories of a profile, by category id,
+        in a single transaction. The other categories are removed if replace_categories is set.
+        """
+        values = values or {}
+        unknown = set(values) - {'plc_name', 'import_source'}
+        if unknown:
+            raise ValueError(f'Unknown profile values: {unknown}')
+        with self._lock, self.connection:
+            profile_id = self._profile_id(name)
+            if values:
+                assignments = ', '.join(f'{key} = ?' for key in values)
+                self.connection.execute(f'UPDATE profiles SET {assignments} WHERE id = ?',
+                                        (*values.values(), profile_id))
+            if replace_categories:
+                self.connection.execute('DELETE FROM categories WHERE profile_id = ?', (profile_id,))
+            if categories_settings:
+                self._write_categories(profile_id, categories_settings)
+
+    def _write_categories(self, profile_id: int, categories_settings: Dict[int, CategorySettings]):
+        removed = [(profile_id, category_id)
+                   for category_id, category in categories_settings.items() if category.is_empty]
+        stored = [(profile_id, category_id, category.name, category.alarm_category.regex,
+                   json.dumps(list(category.alarm_category.bg_color)),
+                   json.dumps(list(category.alarm_category.fg_color)))
+                  for category_id, category in categories_settings.items() if not category.is_empty]
+        self.connection.executemany('DELETE FROM categories WHERE profile_id = ? AND position = ?', removed)
+        self.connection.executemany('INSERT OR REPLACE INTO categories VALUES (?, ?, ?, ?, ?, ?)', stored)
@@ -0,0 +1,103 @@
+import dataclasses
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Number of items (symbols, rows, lines) processed between two progress updates
+UPDATE_EVERY = 1024
+# Minimum delay (in seconds) between two progress reports
+REPORT_INTERVAL = 0.25
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+def _format_size(size: int) -> str:
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+@dataclass
+class Progress:
+    """
+    Progress of a parse and/or XLSX write task at a given time.
+    """
+    task: str
+    elapsed: float = 0.0
+    bytes_read: int = 0
+    total_bytes: int = 0
+    symbols: int = 0
+    rows: int = 0
+    total_rows: int = 0
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """
+        Fraction of the task done, or None if the size of the task isn't known
+        """
+        if self.total_bytes:
+            return min(1.0, self.bytes_read / self.total_bytes)
+        if self.total_rows:
+            return min(1.0, self.rows / self.total_rows)
+        return None
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Estimated remaining time (in seconds), or None if it can't be estimated yet
+        """
+        fraction = self.fraction
+        if not fraction:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+    def __str__(self):
+        parts = []
+        if self.total_bytes:
+            parts.append(f'{_format_size(self.bytes_read)} / {_format_size(self.total_bytes)}')
+        if self.symbols:
+            rate = f' ({self.symbols / self.elapsed:.0f} symbols/s)' if self.elapsed else ''
+            parts.append(f'{self.symbols} symbols{rate}')
+        if self.rows:
+            total = f' / {self.total_rows}' if self.total_rows else ''
+            rate = f' ({self.rows / self.elapsed:.0f} rows/s)' if self.elapsed else ''
+            parts.append(f'{self.rows}{total} rows written{rate}')
+        eta = self.eta
+        if eta is not None:
+            parts.append(f'ETA {eta:.0f} s')
+        return f'{self.task}: ' + ', '.join(parts)
+
+
+class ProgressReporter:
+    """
+    Throttled progress reporting and cooperative cancellation of a long running task.
+
+    The task calls update() regularly (e.g. every UPDATE_EVERY items), which raises TaskCancelled once the cancel
+    event is set. A snapshot of the progress is given to the callback at most every interval seconds.
+    """
+    def __init__(self, task: str, callback: Callable[[Progress], None] = None,
+                 cancel_event: threading.Event = None, interval: float = REPORT_INTERVAL):
+        self.progress = Progress(task)
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.interval = interval
+        self._start = self._last_report = time.perf_counter()
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise TaskCancelled(f'{self.progress.task} cancelled')
+
+    def update(self, **values):
+        """
+        Update some values of the progress (e.g. rows=1000) and report it if the last report is old enough
+        """
+        self.check_cancelled()
+        for name, value in values.items():
+            setattr(self.progress, name, value)
+
+        now = time.perf_counter()
+        if self.callback is not None and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.progress.elapsed = now - self._start
+            self.callback(dataclasses.replace(self.progress))
@@ -1,21 +1,105 @@
 import configparser
+import json
 import logging
-import shutil
+import io
+import os
+import tempfile
+import threading
+from typing import Dict, List
 from platformdirs import user_config_dir
 from pathlib import Path
 
 from src import APP_NAME
+from category_settings import CategorySettings, categories_by_slot
+from profile_store import ProfileError, ProfileStore
 
 
 logger = logging.getLogger(__name__)
 
+# Delay (in seconds) after a change before writing the pending changes
+FLUSH_DELAY = 1.0
+DEFAULT_PROFILE = 'Default'
+# Settings of the [general] section stored by profile
+PROFILE_KEYS = ('plc_name', 'import_source')
+
+
+def _write_atomically(filepath: Path, content: str):
+    fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=filepath.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def categories_from_config(config: configparser.ConfigParser) -> List[CategorySettings]:
+    """
+    Return the categories of the [Categories] section of a settings file in priority order, each one at its slot
+    """
+    if 'Categories' not in config:
+        return []
+    defined = {}
+    for key, value in config['Categories'].items():
+        settings_json = json.loads(value)
+        category = CategorySettings(
+            name=settings_json['name'],
+            regex=settings_json['filter'],
+            bg_color=settings_json['bg_color'],
+            fg_color=settings_json['fg_color'],
+            id=int(key),
+        )
+        # Settings written by the previous versions store the empty categories as well
+        if not category.is_empty:
+            defined[int(key)] = category
+    return categories_by_slot(defined)
+
+
+def _category_to_json(category: CategorySettings) -> str:
+    return json.dumps({
+        'name': category.name,
+        'filter': category.alarm_category.regex,
+        'bg_color': list(category.alarm_category.bg_color),
+        'fg_color': list(category.alarm_category.fg_color)
+    })
+
 
 class SettingsManager:
-    def __init__(self, config_filename: str = "config.ini"):
+    """
+    Application settings stored in an INI file, and settings profiles stored in a ProfileStore.
+
+    The categories, the PLC name and the last import source belong to the selected profile. The other settings are
+    shared by all the profiles.
+
+    Changes are kept in memory and written behind: they are coalesced and flushed by a timer thread shortly after
+    the last change, so the UI thread never waits for the disk. The file is always written atomically (written to a
+    temporary file then renamed over the settings file), so a crash never leaves a half-written file. The changes of
+    the profile values and categories are written behind to the ProfileStore the same way, the pending ones being
+    returned by the getters until they are written.
+    """
+    def __init__(self, config_filename: str = "config.ini", flush_delay: float = FLUSH_DELAY,
+                 profiles_filename: str = "profiles.sqlite3"):
         self.config_dir = Path(user_config_dir(APP_NAME))
         self.config_file = self.config_dir / config_filename
+        self.profiles_file = self.config_dir / profiles_filename
+        # Opened on first use
+        self._profiles = None
         logger.info(f"Config file: {self.config_file}")
         self.config = configparser.ConfigParser()
+        self.flush_delay = flush_delay
+
+        # Protects the config and the pending changes state, shared with the flush timer thread
+        self._lock = threading.RLock()
+        # Serializes the writes of the settings file
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer = None
+        # Profile values and categories (copies, by category id) not written to the profile store yet, by profile
+        self._pending_values: Dict[str, Dict[str, str]] = {}
+        self._pending_categories: Dict[str, Dict[int, CategorySettings]] = {}
 
         self._load_or_create()
 
@@ -34,23 +118,250 @@ class SettingsManager:
         }
 
     def export_to(self, filename):
-        shutil.copyfile(self.config_file, filename)
+        """
+        Write the shared settings and the selected profile settings to a settings file
+        """
+        config = configparser.ConfigParser()
+        with self._lock:
+            config.read_string(self._serialize())
+        config.remove_option('general', 'profile')
+        for key in PROFILE_KEYS:
+            config.set('general', key, self.get_profile_value(key))
+        config['Categories'] = {}
+        for category in self.get_categories_settings():
+            if not category.is_empty:
+                config.set('Categories', str(category.alarm_category.id), _category_to_json(category))
+
+        content = io.StringIO()
+        config.write(content)
+        _write_atomically(Path(filename), content.getvalue())
 
     def import_from(self, filename):
-        shutil.copyfile(filename, self.config_file)
-        self.__init__()
+        """
+        Replace the shared settings and the selected profile settings by the ones of the given settings file,
+        which are left unchanged if it can't be read
+        """
+        config = configparser.ConfigParser()
+        with open(filename) as f:
+            config.read_file(f)
+        current_profile = self.current_profile
+        # Not interleaved with a flush, which could write older pending changes over the imported settings
+        with self._write_lock:
+            self._import_profile_settings(config, current_profile)
+            with self._lock:
+                self._pending_values.pop(current_profile, None)
+                self._pending_categories.pop(current_profile, None)
+        with self._lock:
+            self.config = config
+            self.config.set('general', 'profile', current_profile)
+            self._changed()
+
+    def _import_profile_settings(self, config: configparser.ConfigParser, profile_name: str):
+        """
+        Move the profile settings of a settings file to a profile, in a single transaction once they are all read
+        """
+        if 'general' not in config:
+            config.add_section('general')
+        values = {key: config.get('general', key, fallback='') for key in PROFILE_KEYS}
+        categories_settings = categories_from_config(config)
+        self.profiles.save_profile(profile_name, values,
+                                   {category.alarm_category.id: category for category in categories_settings},
+                                   replace_categories=True)
+        for key in PROFILE_KEYS:
+            config.remove_option('general', key)
+        config.remove_section('Categories')
+
+    @property
+    def profiles(self) -> ProfileStore:
+        if self._profiles is None:
+            self._profiles = ProfileStore(self.profiles_file)
+            if not self._profiles.list_profiles():
+                # Settings written by the previous versions hold the profile settings
+                self._profiles.create_profile(DEFAULT_PROFILE)
+                with self._lock:
+                    self._import_profile_settings(self.config, DEFAULT_PROFILE)
+                    self._changed()
+        return self._profiles
+
+    @property
+    def current_profile(self) -> str:
+        name = self.get('general', 'profile', DEFAULT_PROFILE)
+        if self.profiles.get_profile(name) is None:
+            name = self.profiles.list_profiles()[0]
+            self.set('general', 'profile', name)
+        return name
+
+    def list_profiles(self) -> List[str]:
+        return self.profiles.list_profiles()
+
+    def select_profile(self, name: str):
+        if self.profiles.get_profile(name) is None:
+            raise ProfileError(f'Unknown profile "{name}"')
+        self.set('general', 'profile', name)
+
+    def create_profile(self, name: str):
+        """
+        Create a profile as a copy of the selected one
+        """
+        # The pending changes of the selected profile are copied too
+        self.flush()
+        self.profiles.create_profile(name, copy_from=self.current_profile)
+
+    def delete_profile(self, name: str):
+        """
+        Delete a profile, except the last one. Another profile is selected if it was the selected one
+        """
+        if len(self.list_profiles()) == 1:
+            raise ProfileError('The last profile can\'t be deleted')
+        with self._lock:
+            self._pending_values.pop(name, None)
+            self._pending_categories.pop(name, None)
+        self.profiles.delete_profile(name)
+
+    def get_profile_value(self, key: str) -> str:
+        """
+        Return a setting of the selected profile: 'plc_name' or 'import_source'
+        """
+        profile = self.current_profile
+        with self._lock:
+            pending = self._pending_values.get(profile, {})
+            if key in pending:
+                return pending[key]
+        return getattr(self.profiles.get_profile(profile), key)
+
+    def set_profile_value(self, key: str, value: str):
+        """
+        Set a setting of the selected profile, written behind like the other settings
+        """
+        if key not in PROFILE_KEYS:
+            raise ValueError(f'Unknown profile value: {key}')
+        profile = self.current_profile
+        with self._lock:
+            self._pending_values.setdefault(profile, {})[key] = value
+            self._schedule_flush()
 
     def get(self, section: str, key: str, fallback=None):
         return self.config.get(section, key, fallback=fallback)
 
     def set(self, section: str, key: str, value: str):
-        if section not in self.config:
-            self.config.add_section(section)
-        self.config[section][key] = value
+        with self._lock:
+            if section not in self.config:
+                self.config.add_section(section)
+            if self.config[section].get(key) == value:
+                return
+            self.config[section][key] = value
+            self._changed()
+
+    def remove(self, section: str, key: str):
+        with self._lock:
+            if section in self.config and self.config.remove_option(section, key):
+                self._changed()
+
+    def _changed(self):
+        """
+        Record a change of the settings file and schedule a flush unless one is already pending
+        """
+        self._dirty = True
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _serialize(self) -> str:
+        content = io.StringIO()
+        self.config.write(content)
+        return content.getvalue()
+
+    def flush(self):
+        """
+        Write the pending changes to the settings file and to the profile store, if any
+        """
+        with self._write_lock:
+            with self._lock:
+                self._flush_timer = None
+                content = self._serialize() if self._dirty else None
+                self._dirty = False
+                pending_values = {profile: dict(values) for profile, values in self._pending_values.items()}
+                pending_categories = {profile: dict(categories)
+                                      for profile, categories in self._pending_categories.items()}
+            for profile in pending_values.keys() | pending_categories.keys():
+                self._write_profile(profile, pending_values.get(profile, {}), pending_categories.get(profile, {}))
+            if content is not None:
+                _write_atomically(self.config_file, content)
+                logger.debug(f'Settings written to {self.config_file}')
+
+    def _write_profile(self, profile: str, values: Dict[str, str], categories_settings: Dict[int, CategorySettings]):
+        """
+        Write the pending changes of a profile, then forget the ones which weren't changed again meanwhile
+        """
+        try:
+            self.profiles.save_profile(profile, values, categories_settings)
+        except ProfileError as e:
+            # Deleted meanwhile
+            logger.warning(f'Changes of profile "{profile}" not saved: {e}')
+        with self._lock:
+            pending_values = self._pending_values.get(profile, {})
+            for key, value in values.items():
+                if pending_values.get(key) == value:
+                    del pending_values[key]
+            pending_categories = self._pending_categories.get(profile, {})
+            for category_id, category in categories_settings.items():
+                if pending_categories.get(category_id) is category:
+                    del pending_categories[category_id]
+            if not pending_values:
+                self._pending_values.pop(profile, None)
+            if not pending_categories:
+                self._pending_categories.pop(profile, None)
+
+    def close(self):
+        """
+        Write the pending changes before exiting, without touching the settings file if nothing changed
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self.flush()
+        if self._profiles is not None:
+            self._profiles.close()
 
     def save(self):
-        with self.config_file.open('w') as f:
-            self.config.write(f)
+        """
+        Write the settings file now, whether there are pending changes or not
+        """
+        with self._lock:
+            self._dirty = True
+        self.flush()
+
+    def get_categories_settings(self) -> List[CategorySettings]:
+        """
+        Return the categories of the selected profile in priority order, their ids being their positions in the list.
+        The free slots between the defined categories are empty categories.
+        """
+        profile = self.current_profile
+        categories_settings = self.profiles.get_categories(profile)
+        with self._lock:
+            pending = dict(self._pending_categories.get(profile, {}))
+        if not pending:
+            return categories_settings
+        defined = {category.alarm_category.id: category for category in categories_settings}
+        defined.update((category_id, category.copy()) for category_id, category in pending.items())
+        return categories_by_slot({category_id: category for category_id, category in defined.items()
+                                   if not category.is_empty})
+
+    def set_categories_settings(self, categories_settings: Dict[int, CategorySettings]):
+        """
+        Set the settings of the given categories of the selected profile, by category id, written behind like the
+        other settings
+        """
+        profile = self.current_profile
+        with self._lock:
+            self._pending_categories.setdefault(profile, {}).update(
+                (category_id, category.copy()) for category_id, category in categories_settings.items())
+            self._schedule_flush()
 
     def as_dict(self):
         return {section: dict(self.config[section]) for section in self.config.sections()}
@@ -0,0 +1,79 @@
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Time of the first import of this module (the first one of the application), used as the launch time if the
+# process creation time isn't known
+IMPORT_TIME = time.time()
+# Seconds between the FILETIME epoch (1601-01-01) and the Unix epoch
+_FILETIME_EPOCH_OFFSET = 11644473600
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+
+def _windows_process_creation_time(pid: int) -> Optional[float]:
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        creation, exit_time, kernel_time, user_time = (wintypes.FILETIME() for _ in range(4))
+        if not kernel32.GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exit_time),
+                                        ctypes.byref(kernel_time), ctypes.byref(user_time)):
+            return None
+    finally:
+        kernel32.CloseHandle(handle)
+    # Number of 100 ns intervals since the FILETIME epoch
+    ticks = (creation.dwHighDateTime << 32) | creation.dwLowDateTime
+    return ticks / 10_000_000 - _FILETIME_EPOCH_OFFSET
+
+
+def is_onefile_bundle() -> bool:
+    """
+    Tell if the application is a PyInstaller onefile executable: its files are extracted to a _MEIxxxxxx temporary
+    directory by a bootloader process, which then starts the application process.
+    """
+    bundle_dir = getattr(sys, '_MEIPASS', None)
+    return bundle_dir is not None and Path(bundle_dir).name.startswith('_MEI')
+
+
+def launch_time() -> Tuple[float, str]:
+    """
+    Return the time the application was launched (time.time() clock) and the event it corresponds to.
+
+    On Windows, it is the creation time of the process, or of the bootloader process for a onefile executable, so
+    the extraction of the bundled files is taken into account.
+    """
+    if sys.platform == 'win32':
+        onefile = is_onefile_bundle()
+        try:
+            creation_time = _windows_process_creation_time(os.getppid() if onefile else os.getpid())
+        except OSError as e:
+            logger.debug(f'Unable to get the process creation time: {e}')
+            creation_time = None
+        if creation_time is not None:
+            return creation_time, 'bootloader start' if onefile else 'process start'
+    return IMPORT_TIME, 'imports start'
+
+
+def log_time_to_first_window(window):
+    """
+    Log the time from the application launch to the first time the Tk window is shown
+    """
+    def on_map(event):
+        if event.widget is not window:
+            # The window bindings also receive the events of its children
+            return
+        window.unbind('<Map>', binding)
+        start, start_event = launch_time()
+        logger.info(f'First window shown {time.time() - start:.3f} s after the {start_event}')
+
+    binding = window.bind('<Map>', on_map, add='+')
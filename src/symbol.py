@@ -24,3 +24,12 @@ class Symbol:
     @comment.setter
     def comment(self, value: str):
         self._comment = parse_comment(value)
+
+    @classmethod
+    def from_parsed_comment(cls, name: str, type: str, comment: str) -> 'Symbol':
+        """
+        Create a symbol from a comment already parsed (e.g. read back from the symbol cache)
+        """
+        symbol = cls(name=name, type=type, comment='')
+        symbol._comment = comment
+        return symbol
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from platformdirs import user_cache_dir
+
+from src import APP_NAME
+from import_source import ImportSource
+from progress import ProgressReporter
+from symbol import Symbol
+from sysmac_symbols import MalformedLines
+
+
+logger = logging.getLogger(__name__)
+
+# Change it when the stored data changes to ignore the entries written by previous versions
+CACHE_FORMAT_VERSION = 4
+# Number of symbols pickled at once
+BATCH_SIZE = 10000
+# Age (in seconds) above which an entry file missing from the index is removed, younger ones may still be added to
+# the index by another process
+ORPHAN_MIN_AGE = 60
+
+# Files modified less than this number of seconds before their key is computed may be modified again without any
+# change of their size and modification time (coarse timestamps): their content hash is added to their key
+RACY_SECONDS = 2.0
+
+# Held with the lock file while the index is read, updated and saved, as several tasks (threads of the application or
+# processes of the command line converter) may use the cache at the same time
+_index_lock = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """
+    Hold an exclusive lock on a file, waiting for the other processes holding it
+    """
+    with open(path, 'a+b') as f:
+        if sys.platform == 'win32':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    # Retries for 10 seconds before failing
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def file_digest(filepath, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SymbolCache:
+    """
+    On-disk cache of the symbols read from symbol files, so an unchanged file isn't parsed again.
+
+    Entries are keyed by the import source, the file path, size and modification time, so finding an entry doesn't
+    read the file. The content hash is only added for the files modified just before (see RACY_SECONDS).
+    Each entry is a stream of pickled batches of (name, type, comment) tuples, the malformed lines skipped while
+    reading the file are kept in the index. The least recently used entries are evicted when the total size of the
+    cache exceeds max_size.
+
+    The index is loaded again and updated under a lock file each time it changes, so the entries added by other
+    instances (e.g. concurrent parsing tasks or conversion processes) aren't lost.
+    """
+    def __init__(self, max_size: int = 256 * 1024 * 1024, cache_dir=None):
+        self.cache_dir = Path(cache_dir or user_cache_dir(APP_NAME)) / 'symbols'
+        self.index_file = self.cache_dir / 'index.json'
+        self.lock_file = self.cache_dir / 'index.lock'
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _load_index(self) -> dict:
+        try:
+            with self.index_file.open() as f:
+                index = json.load(f)
+            if index.get('version') == CACHE_FORMAT_VERSION:
+                return index
+        except (OSError, ValueError) as e:
+            logger.debug(f'Symbol cache index not loaded: {e}')
+        return {'version': CACHE_FORMAT_VERSION, 'entries': {}}
+
+    def _save_index(self, index: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_file)
+
+    def _update_index(self, update: Callable[[dict], None]):
+        """
+        Apply the update to the latest index and save it
+        """
+        with _index_lock, _file_lock(self.lock_file):
+            index = self._load_index()
+            update(index)
+            self._save_index(index)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.pickle'
+
+    def key(self, import_src: ImportSource, filepath) -> str:
+        path = Path(filepath).resolve()
+        stat = path.stat()
+        fingerprint = f'{import_src.name}|{path}|{stat.st_size}|{stat.st_mtime_ns}'
+        if time.time() - stat.st_mtime < RACY_SECONDS:
+            fingerprint += f'|{file_digest(path)}'
+        return hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+
+    def load(self, key: str, malformed: MalformedLines = None, progress: ProgressReporter = None,
+             timings: Counter = None) -> Optional[Iterator[Symbol]]:
+        """
+        Return an iterator over the cached symbols or None if the entry doesn't exist.
+
+        The malformed lines skipped when the file was parsed are added to malformed. The progress, if given, is
+        updated with the equivalent bytes of the symbols file read as the entry is read. The time spent reading the
+        batches of the entry is added to timings['read'] as they are consumed.
+        """
+        entry = None
+
+        def touch(index: dict):
+            nonlocal entry
+            entry = index['entries'].get(key)
+            if entry is not None:
+                entry['last_used'] = time.time()
+
+        self._update_index(touch)
+        if entry is None or not self._entry_path(key).exists():
+            return None
+        if malformed is not None:
+            count, samples = entry.get('malformed', (0, []))
+            malformed.extend(MalformedLines(count, [tuple(sample) for sample in samples]))
+        logger.info(f'Symbols read from cache entry {key}')
+        return self._iter_entry(self._entry_path(key), progress, timings)
+
+    @staticmethod
+    def _iter_entry(entry_path: Path, progress: ProgressReporter = None,
+                    timings: Counter = None) -> Iterator[Symbol]:
+        if timings is None:
+            timings = Counter()
+        entry_size = entry_path.stat().st_size or 1
+        with entry_path.open('rb') as f:
+            while True:
+                start = time.perf_counter()
+                try:
+                    batch = pickle.load(f)
+                except EOFError:
+                    return
+                finally:
+                    timings['read'] += time.perf_counter() - start
+                if progress is not None:
+                    progress.update(bytes_read=progress.progress.total_bytes * f.tell() // entry_size)
+                for name, symbol_type, comment in batch:
+                    yield Symbol.from_parsed_comment(name=name, type=symbol_type, comment=comment)
+
+    def writer(self, key: str, malformed: MalformedLines = None) -> 'CacheEntryWriter':
+        """
+        Return a context manager to add the symbols of a new entry one by one.
+
+        The entry is only added to the cache if the context exits without exception, with the malformed lines
+        skipped at this time.
+        """
+        return CacheEntryWriter(self, key, malformed)
+
+    def store(self, key: str, symbols: Iterable[Symbol], malformed: MalformedLines = None) -> Iterator[Symbol]:
+        """
+        Yield the symbols while writing them to a new cache entry, added once all the symbols have been consumed.
+        """
+        with self.writer(key, malformed) as writer:
+            for symbol in symbols:
+                writer.add(symbol)
+                yield symbol
+
+    def _add_entry(self, key: str, tmp_path: str, malformed: MalformedLines = None):
+        if malformed is None:
+            malformed = MalformedLines()
+
+        def add(index: dict):
+            os.replace(tmp_path, self._entry_path(key))
+            index['entries'][key] = {'size': self._entry_path(key).stat().st_size, 'last_used': time.time(),
+                                     'malformed': (malformed.count, malformed.samples)}
+            self._evict(index)
+
+        self._update_index(add)
+
+    def _evict(self, index: dict):
+        entries = index['entries']
+        self._remove_orphans(entries)
+        total_size = sum(entry['size'] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total_size <= self.max_size:
+                break
+            total_size -= entries.pop(key)['size']
+            self._entry_path(key).unlink(missing_ok=True)
+            logger.debug(f'Symbol cache entry {key} evicted')
+
+    def _remove_orphans(self, entries: dict):
+        """
+        Remove the entry files missing from the index (e.g. written by a previous version or lost by a crash),
+        which would never be evicted otherwise
+        """
+        now = time.time()
+        for entry_path in self.cache_dir.glob('*.pickle'):
+            if entry_path.stem in entries:
+                continue
+            try:
+                if now - entry_path.stat().st_mtime >= ORPHAN_MIN_AGE:
+                    entry_path.unlink()
+                    logger.debug(f'Symbol cache file {entry_path.name} not indexed, removed')
+            except OSError as e:
+                logger.debug(f'Symbol cache file {entry_path.name} not removed: {e}')
+
+
+class CacheEntryWriter:
+    def __init__(self, cache: SymbolCache, key: str, malformed: MalformedLines = None):
+        self.cache = cache
+        self.key = key
+        self.malformed = malformed
+        self._batch = []
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+
+    def add(self, symbol: Symbol):
+        self._batch.append((symbol.name, symbol.type, symbol.comment))
+        if len(self._batch) >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        pickle.dump(self._batch, self._file, pickle.HIGHEST_PROTOCOL)
+        self._batch = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                if self._batch:
+                    self._flush()
+                self._file.close()
+                self.cache._add_entry(self.key, self._tmp_path, self.malformed)
+        finally:
+            self._file.close()
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
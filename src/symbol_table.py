@@ -0,0 +1,121 @@
+import logging
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from alarm_table import AlarmTable
+from category_set import CategorySet
+from category_settings import CategorySettings
+from symbol import Symbol
+
+
+logger = logging.getLogger(__name__)
+
+# Category index of the symbols not assigned to any category
+NO_CATEGORY = -1
+
+
+class SymbolTable:
+    """
+    Every symbol of a parsed file with the index of the category it is assigned to (NO_CATEGORY if no category
+    matches).
+
+    Unmatched symbols are kept as well so the symbols can be categorized again when the categories filters change,
+    without reading the file again. The filters used for the current assignment are recorded to find which
+    categories changed.
+
+    Symbols are stored in parallel columns instead of Symbol objects: names and parsed comments, the types as
+    indexes in the list of the distinct types and the category indexes as 32-bit integers. The names are stored
+    without the address prefix of their import source, which is added when they are matched and in the alarms.
+    """
+    def __init__(self, categories: List[CategorySettings], name_prefix: str = ''):
+        self.name_prefix = name_prefix
+        self.names: List[str] = []
+        self.comments: List[str] = []
+        self.types: List[str] = []
+        self.type_ids = array('I')
+        self.category_indexes = array('i')
+        self._type_ids: Dict[str, int] = {}
+        self._filters = self._get_filters(categories)
+
+    @staticmethod
+    def _get_filters(categories: List[CategorySettings]) -> List[str]:
+        return [category.alarm_category.regex for category in categories]
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, symbol: Symbol, category_index: Optional[int]):
+        type_id = self._type_ids.get(symbol.type)
+        if type_id is None:
+            type_id = self._type_ids[symbol.type] = len(self.types)
+            self.types.append(symbol.type)
+        self.names.append(symbol.name)
+        self.comments.append(symbol.comment)
+        self.type_ids.append(type_id)
+        self.category_indexes.append(NO_CATEGORY if category_index is None else category_index)
+
+    def symbol(self, row: int) -> Symbol:
+        return Symbol.from_parsed_comment(self.names[row], self.types[self.type_ids[row]], self.comments[row])
+
+    @property
+    def alarms_count(self) -> int:
+        return len(self.category_indexes) - self.category_indexes.count(NO_CATEGORY)
+
+    def alarms(self, categories: List[CategorySettings]) -> AlarmTable:
+        """
+        Return the alarms of the symbols assigned to a category, in the file order.
+        """
+        category_indexes = self.category_indexes
+        rows = array('I', (row for row, index in enumerate(category_indexes) if index != NO_CATEGORY))
+        return AlarmTable(self.names, self.comments, self.types, self.type_ids,
+                          rows, array('i', (category_indexes[row] for row in rows)),
+                          [category.alarm_category for category in categories], self.name_prefix)
+
+    def first_changed_category(self, categories: List[CategorySettings]) -> Optional[int]:
+        """
+        Return the index of the highest priority category whose filter changed or None if no filter changed.
+        """
+        filters = self._get_filters(categories)
+        for index, (old_filter, new_filter) in enumerate(zip(self._filters, filters)):
+            if old_filter != new_filter:
+                return index
+        if len(filters) != len(self._filters):
+            return min(len(filters), len(self._filters))
+        return None
+
+    def recategorize(self, categories: List[CategorySettings]) -> Tuple['SymbolTable', int]:
+        """
+        Return a table of the symbols assigned to the categories again after some filters changed, and the number of
+        symbols evaluated.
+
+        This table is left unchanged, so its users (e.g. the alarms shown, the match counts preview) stay consistent
+        while the new table is built. The symbol columns are shared by both tables, none of them must be appended to.
+        Categories are searched in priority order, so a symbol assigned to a category before the first changed one
+        keeps its category. Only the symbols assigned to the first changed category or a lower priority one and the
+        unmatched symbols are evaluated again, against the changed and lower priority categories.
+        """
+        start = self.first_changed_category(categories)
+        if start is None:
+            return self, 0
+
+        table = SymbolTable(categories, self.name_prefix)
+        table.names = self.names
+        table.comments = self.comments
+        table.types = self.types
+        table.type_ids = self.type_ids
+        table._type_ids = self._type_ids
+        table.category_indexes = array('i', self.category_indexes)
+
+        category_set = CategorySet(categories, start, self.name_prefix)
+        names = self.names
+        category_indexes = table.category_indexes
+        evaluated = 0
+        for row, index in enumerate(category_indexes):
+            if index != NO_CATEGORY and index < start:
+                continue
+            index = category_set.match(names[row])
+            category_indexes[row] = NO_CATEGORY if index is None else index
+            evaluated += 1
+
+        logger.info(f'{evaluated} out of {len(self)} symbols categorized again from category {start}')
+        return table, evaluated
@@ -0,0 +1,252 @@
+import codecs
+import locale
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from progress import ProgressReporter
+from symbol import Symbol
+
+
+logger = logging.getLogger(__name__)
+
+# Number of bytes read and decoded at once
+BLOCK_SIZE = 1024 * 1024
+# Size of the blocks of the file checked at once when detecting its encoding
+ENCODING_BLOCK_SIZE = 1024 * 1024
+# Name, data type, AT specification and comment
+MIN_FIELDS = 4
+# Number of malformed lines kept to be reported
+MAX_MALFORMED_SAMPLES = 20
+
+
+class MalformedLine(ValueError):
+    pass
+
+
+@dataclass
+class MalformedLines:
+    """
+    Count of the malformed lines skipped while reading a symbols file, with the first ones to report them.
+    """
+    count: int = 0
+    # (line number, reason, beginning of the line) of the first malformed lines
+    samples: List[Tuple[int, str, str]] = field(default_factory=list)
+
+    def __bool__(self):
+        return self.count > 0
+
+    def add(self, line_number: int, reason: str, line: str):
+        self.count += 1
+        if len(self.samples) < MAX_MALFORMED_SAMPLES:
+            self.samples.append((line_number, reason, line[:80].rstrip()))
+
+    def extend(self, other: 'MalformedLines', line_offset: int = 0):
+        """
+        Add the malformed lines of a part of the file starting after line_offset lines
+        """
+        self.count += other.count
+        free = MAX_MALFORMED_SAMPLES - len(self.samples)
+        self.samples.extend((line_offset + line_number, reason, line)
+                            for line_number, reason, line in other.samples[:free])
+
+    def __str__(self):
+        lines = [f'{self.count} malformed lines skipped']
+        lines.extend(f'  line {line_number}: {reason}: {line!r}' for line_number, reason, line in self.samples)
+        if self.count > len(self.samples):
+            lines.append('  ...')
+        return '\n'.join(lines)
+
+
+def is_utf8(filepath) -> bool:
+    """
+    Tell if the whole file is valid UTF-8
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(filepath, 'rb') as f:
+        try:
+            while block := f.read(ENCODING_BLOCK_SIZE):
+                # A block may end in the middle of a character
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def bom_encoding(filepath) -> Optional[str]:
+    """
+    Return the encoding given by the BOM of a file, or None if it has no BOM
+    """
+    with open(filepath, 'rb') as f:
+        bom = f.read(len(codecs.BOM_UTF8))
+    if bom.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if bom.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    return None
+
+
+def ansi_encoding() -> str:
+    """
+    Return the ANSI code page Sysmac Studio exports with on Windows
+    """
+    encoding = locale.getpreferredencoding(False)
+    return 'cp1252' if codecs.lookup(encoding).name == 'utf-8' else encoding
+
+
+def detect_encoding(filepath) -> str:
+    """
+    Return the encoding of a symbols file: given by its BOM if any, UTF-8 if the whole file is valid UTF-8,
+    otherwise the ANSI code page.
+
+    The whole file is checked, as an ANSI export may only have accented characters far from its beginning.
+    """
+    encoding = bom_encoding(filepath)
+    if encoding is not None:
+        return encoding
+    return 'utf-8' if is_utf8(filepath) else ansi_encoding()
+
+
+def iter_decoded_blocks(f: BinaryIO, encoding: Optional[str], block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    """
+    Read and decode a binary file by blocks, in the given encoding. Without encoding, the file is decoded as UTF-8
+    until the first byte which isn't valid UTF-8, then in the ANSI code page from the block of this byte: the file
+    is read once, instead of being checked before being decoded.
+    """
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')()
+    ascii_only = True
+    while True:
+        data = f.read(block_size)
+        try:
+            block = decoder.decode(data, final=not data)
+        except UnicodeDecodeError:
+            if encoding is not None:
+                raise
+            encoding = ansi_encoding()
+            if not ascii_only:
+                logger.warning(f'{f.name}: not UTF-8 from byte {f.tell() - len(data)}, the text read until there '
+                               f'was decoded as UTF-8 and the remaining one is decoded as {encoding}')
+            # Bytes of a character started at the end of the previous block are kept by the decoder
+            pending_data = decoder.getstate()[0]
+            decoder = codecs.getincrementaldecoder(encoding)()
+            block = decoder.decode(pending_data + data, final=not data)
+        if not data:
+            if block:
+                yield block
+            return
+        if encoding is None and ascii_only:
+            ascii_only = block.isascii()
+        yield block
+
+
+def is_byte_splittable(encoding: str) -> bool:
+    """
+    Tell if the encoded file can be split on newline bytes, e.g. to parse chunks of it in several processes
+    """
+    if codecs.lookup(encoding).name == 'utf-16':
+        return False
+    # utf-8-sig writes a BOM before any encoded text, it is only found at the start of the file
+    newline = '\n'.encode(encoding)
+    return newline.removeprefix(codecs.BOM_UTF8) == b'\n'
+
+
+def is_header_line(line: str) -> bool:
+    fields = line.split('\t')
+    return len(fields) >= 2 and fields[0].strip().lower() == 'name' and fields[1].strip().lower() == 'data type'
+
+
+def parse_symbol_line(line: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Return the (name, type, comment) of a symbol line, or None for a blank line or a header line.
+    Raise MalformedLine if the line isn't a symbol definition.
+    """
+    fields = line.split('\t')
+    if len(fields) < MIN_FIELDS:
+        if not line.strip():
+            return None
+        raise MalformedLine(f'{len(fields)} fields instead of {MIN_FIELDS}')
+    name = fields[0].strip()
+    if not name:
+        raise MalformedLine('no symbol name')
+    if is_header_line(line):
+        return None
+    # The comment is stripped by Symbol
+    return name, fields[1], fields[3]
+
+
+def iter_symbol_lines(lines: List[str], malformed: MalformedLines, first_line_number: int = 1
+                      ) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield the (name, type, comment) of the symbol lines, the malformed lines are counted and skipped.
+    A header is only looked for on the first line of the file.
+    """
+    if first_line_number == 1 and lines and is_header_line(lines[0]):
+        lines = lines[1:]
+        first_line_number = 2
+
+    # Most of the reading time is spent here: the symbol lines are handled without numbering the lines, the line
+    # number of the other ones is found back from their position in the list
+    search_from = 0
+    for line in lines:
+        fields = line.split('\t')
+        if len(fields) >= MIN_FIELDS:
+            name = fields[0].strip()
+            if name:
+                yield name, fields[1], fields[3]
+                continue
+        position = lines.index(line, search_from)
+        search_from = position + 1
+        try:
+            symbol = parse_symbol_line(line)
+        except MalformedLine as e:
+            malformed.add(first_line_number + position, str(e), line)
+            continue
+        if symbol is not None:
+            yield symbol
+
+
+def iter_sysmac_symbols(symbols_filepath, progress: ProgressReporter = None,
+                        malformed: MalformedLines = None, timings: Counter = None) -> Iterator[Symbol]:
+    """
+    Read the symbols of a Sysmac Studio symbols file: one tab separated line by symbol. The symbol names are
+    yielded without their 'VAR://' address prefix.
+
+    The file is decoded by large blocks, in the encoding of its BOM, as UTF-8 or in the ANSI code page if it isn't
+    valid UTF-8 (see iter_decoded_blocks()). Lines which aren't symbol definitions are skipped and counted in
+    malformed instead of stopping the reading.
+    The time spent reading and decoding the blocks is added to timings['read'].
+    """
+    if malformed is None:
+        malformed = MalformedLines()
+    if timings is None:
+        timings = Counter()
+    skipped = malformed.count
+    encoding = bom_encoding(symbols_filepath)
+    logger.debug(f'Reading {symbols_filepath} as {encoding or "UTF-8 or ANSI"}')
+
+    line_number = 1
+    with open(symbols_filepath, 'rb') as f:
+        blocks = iter_decoded_blocks(f, encoding)
+        pending = ''
+        while True:
+            start = time.perf_counter()
+            block = next(blocks, None)
+            timings['read'] += time.perf_counter() - start
+            if block is None:
+                break
+            if progress is not None:
+                progress.update(bytes_read=f.tell())
+            lines = (pending + block).split('\n')
+            # The last line may continue in the next block
+            pending = lines.pop()
+            for name, symbol_type, comment in iter_symbol_lines(lines, malformed, line_number):
+                yield Symbol(name=name, type=symbol_type, comment=comment)
+            line_number += len(lines)
+        for name, symbol_type, comment in iter_symbol_lines([pending], malformed, line_number):
+            yield Symbol(name=name, type=symbol_type, comment=comment)
+
+    if malformed.count > skipped:
+        logger.warning(f'{symbols_filepath}: {malformed}')
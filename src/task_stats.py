@@ -0,0 +1,141 @@
+import cProfile
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Phases of the tasks, in the order the symbols go through them
+PHASES = ('read', 'parse', 'match', 'write')
+# Directory where the profile of each task is dumped (profiling is disabled when not set)
+PROFILE_DIR_VARIABLE = 'EB_ALARMS_PROFILE_DIR'
+
+
+@dataclass
+class TaskStats:
+    """
+    Wall time of each phase of a task and its throughput.
+
+    The phases of a task streaming the symbols are interleaved, the time of a phase is the sum of its batches.
+    Time which isn't spent in a phase (e.g. filling the symbol table) is only counted in the total.
+    With the parallel parsing, the worker processes read, parse and match the symbols: the time waited for their
+    results is counted as parse time.
+    """
+    task: str
+    total_seconds: float = 0.0
+    seconds: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))
+    symbols: int = 0
+    rows: int = 0
+    # Category filter patterns searched, several filters may be merged into a single pattern
+    regex_evaluations: int = 0
+
+    def add_summary(self, summary):
+        """
+        Add the phases timings and counters of an ImportSummary
+        """
+        for phase, seconds in summary.seconds.items():
+            self.seconds[phase] += seconds
+        self.symbols += summary.symbols
+        self.regex_evaluations += summary.regex_evaluations
+
+    @property
+    def symbols_per_second(self) -> float:
+        parse_seconds = self.seconds['read'] + self.seconds['parse'] + self.seconds['match']
+        return self.symbols / parse_seconds if parse_seconds else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds['write'] if self.seconds['write'] else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Return the stats as a structured record, e.g. to be logged as JSON
+        """
+        return {
+            'task': self.task,
+            'total_seconds': round(self.total_seconds, 3),
+            'seconds': {phase: round(seconds, 3) for phase, seconds in self.seconds.items()},
+            'symbols': self.symbols,
+            'symbols_per_second': round(self.symbols_per_second),
+            'rows': self.rows,
+            'rows_per_second': round(self.rows_per_second),
+            'regex_evaluations': self.regex_evaluations,
+        }
+
+    def short_text(self) -> str:
+        """
+        Return the throughput of the task as shown in the status bar
+        """
+        parts = [f'{self.total_seconds:.1f} s']
+        if self.symbols:
+            parts.append(f'{self.symbols_per_second:.0f} symbols/s')
+        if self.rows:
+            parts.append(f'{self.rows_per_second:.0f} rows/s')
+        return ', '.join(parts)
+
+    def __str__(self):
+        phases = ', '.join(f'{phase} {seconds:.3f} s' for phase, seconds in self.seconds.items() if seconds)
+        return (f'{self.task}: {self.total_seconds:.3f} s ({phases or "no phase"}), '
+                f'{self.symbols} symbols ({self.symbols_per_second:.0f}/s), {self.rows} rows '
+                f'({self.rows_per_second:.0f}/s), {self.regex_evaluations} regex evaluations')
+
+
+@contextmanager
+def timed(stats: TaskStats, phase: str = None):
+    """
+    Add the time spent in the block to the phase, or to the total time of the task if no phase is given
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if phase is None:
+            stats.total_seconds += elapsed
+        else:
+            stats.seconds[phase] += elapsed
+
+
+def profile_path(name: str) -> Optional[Path]:
+    """
+    Return the file where to dump the profile of a task, or None if profiling isn't enabled
+    """
+    profile_dir = os.environ.get(PROFILE_DIR_VARIABLE)
+    if not profile_dir:
+        return None
+    return Path(profile_dir) / f'{name}-{time.strftime("%Y%m%d-%H%M%S")}.prof'
+
+
+@contextmanager
+def profiled(name: str):
+    """
+    Run the block in cProfile if the EB_ALARMS_PROFILE_DIR environment variable is set, and dump the profile
+    to a file of this directory (it can be read with pstats or snakeviz).
+
+    Only the current thread is profiled: not the other tasks nor the parallel parsing processes.
+    """
+    path = profile_path(name)
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Only one profiler can be active at a time since Python 3.12
+        logger.warning(f'{name} not profiled: {e}')
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+        logger.info(f'{name} profile saved to {path}')
@@ -1,5 +1,8 @@
 from .categories_settings_dialog import CategoriesSettingsDialog
+from .match_counter import MatchCounterThread
+from .notifying_queue import NotifyingQueue
 from .scrollable_frame import ScrollableFrame
 from .status_bar import StatusBar
+from .task_executor import TaskExecutor, TaskHandle
 from .truncated_label import TruncatedLabel
-from .worker_thread import WorkerThread
+from .virtual_grid import VirtualGrid
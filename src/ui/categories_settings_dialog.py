@@ -1,30 +1,50 @@
-import copy
-import json
 import logging
-import pickle
+import queue
+import re
 import tkinter as tk
 from tkinter import colorchooser
 from tkinter import ttk
 from tkinter.messagebox import askyesno
 
-from .scrollable_frame import ScrollableFrame
+from .match_counter import MatchCounterThread
+from .notifying_queue import NotifyingQueue
+from .virtual_grid import VirtualGrid
+from src.category_model import CategoryModel
 from src.category_settings import CategorySettings
 
 BACKGROUND = 1
 FOREGROUND = 2
 
+# Delay without keystroke before counting the symbols matching an edited filter
+MATCH_COUNT_DELAY_MS = 300
+
 
 logger = logging.getLogger(__name__)
 
 
 class CategoriesSettingsDialog(tk.Toplevel):
 
-    def __init__(self, master, categories_settings, settings_manager, **kwargs):
+    def __init__(self, master, categories_settings, settings_manager, symbol_names=None, name_prefix='', **kwargs):
+        """
+        The symbol names of the last imported file, if any, are used to preview the number of symbols each filter
+        matches, with the address prefix of their import source added in front.
+        """
         super().__init__(master, **kwargs)
         self.master = master
-        self.categories = categories_settings
+        # Changes are tracked to only save the changed categories
+        self.model = CategoryModel(categories_settings)
+        # An empty row is always available at the end to define a new category
+        self.append_empty_category()
         self.settings_manager = settings_manager
 
+        # Symbols matching the filters are counted in the background
+        self.match_counter = None
+        self.match_count_queue = NotifyingQueue(self, '<<MatchCount>>')
+        self._match_count_jobs = {}
+        if symbol_names:
+            self.match_counter = MatchCounterThread(symbol_names, self.match_count_queue, name_prefix)
+            self.match_counter.start()
+
         self.title(f'Categories settings')
         self.minsize(600, 200)
         self.geometry('600x400')
@@ -32,73 +52,77 @@ class CategoriesSettingsDialog(tk.Toplevel):
         # Make dialog modal
         self.grab_set()
 
-        # Used to check for modifications by serialization
-        self._categories_copy = copy.deepcopy(self.categories)
+        # Texts of the filters being typed which are not valid regular expressions, by category row
+        self.invalid_filters = {}
+        # Texts shown in the matches column, by category row
+        self.match_counts = {}
 
         main_frm = ttk.Frame(self, padding=10)
-        frame = ScrollableFrame(main_frm)
-        category_frm = ttk.Frame(frame.scrollable_frame)
-
-        self.category_headings(category_frm)
-        self.name_entries = []
-        for row, category in enumerate(self.categories, start=1):
-            self.show_category(category_frm, row, category)
+        # Only the widgets of the visible categories are created
+        self.category_grid = VirtualGrid(main_frm,
+                                         item_count=len(self.model),
+                                         create_row=self.create_category_row,
+                                         bind_row=self.bind_category_row,
+                                         create_headings=self.category_headings)
 
         button = tk.Button(main_frm, text='Apply changes', command=self.on_apply_change_button)
 
         main_frm.pack(fill='both', expand=True)
         button.pack(side='bottom')
-        category_frm.pack()
-        frame.pack(fill='both', expand=True)
+        self.category_grid.pack(fill='both', expand=True)
+        self.model.subscribe(self.on_category_change)
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        if self.match_counter:
+            for row, category in enumerate(self.model):
+                if category.alarm_category.regex != '':
+                    self.request_match_count(row)
+            self.bind('<<MatchCount>>', self.on_match_count)
+
     @property
     def categories_settings(self):
-        return self._categories_copy
+        return self.model.categories
 
-    def choose_color(self, button, row, color_type):
+    def choose_color(self, row, color_type):
         if color_type == FOREGROUND:
             color_type_str = 'foreground'
-            default_color = self.categories[row].alarm_category.fg_color_hex
+            default_color = self.model[row].alarm_category.fg_color_hex
         else:
             color_type_str = 'background'
-            default_color = self.categories[row].alarm_category.bg_color_hex
+            default_color = self.model[row].alarm_category.bg_color_hex
 
         (rgb_color, html_color) = colorchooser.askcolor(color=default_color,
                                                         title=f"Choose {color_type_str} color for category #{row:0{3}}")
         if html_color:
             if color_type == BACKGROUND:
-                self.categories[row].alarm_category.bg_color = rgb_color
-                self.name_entries[row].configure(background=html_color)
+                self.model.set_bg_color(row, rgb_color)
             elif color_type == FOREGROUND:
-                self.categories[row].alarm_category.fg_color = rgb_color
-                self.name_entries[row].configure(foreground=html_color)
-
-            # Update button color
-            button.configure(bg=html_color)
+                self.model.set_fg_color(row, rgb_color)
 
     def category_headings(self, parent_frame):
         ttk.Label(parent_frame, text="Name").grid(row=0, column=1)
         ttk.Label(parent_frame, text="Filter").grid(row=0, column=2)
         ttk.Label(parent_frame, text="Background").grid(row=0, column=3)
         ttk.Label(parent_frame, text="Foreground").grid(row=0, column=4)
+        if self.match_counter:
+            ttk.Label(parent_frame, text="Matches").grid(row=0, column=5)
+
+    def append_empty_category(self):
+        if len(self.model) == 0 or not self.model[-1].is_empty:
+            self.model.append(CategorySettings.empty(len(self.model)))
+
+    def on_category_change(self, row):
+        self.category_grid.refresh_item(row)
+        if row == len(self.model) - 1:
+            self.append_empty_category()
+            self.category_grid.set_item_count(len(self.model))
 
     def on_apply_change_button(self):
-        for category_id, category in enumerate(self.categories):
-            # Save only changes
-            differences = pickle.dumps(self._categories_copy[category_id]) != pickle.dumps(self.categories[category_id])
-            if differences:
-                category_settings = {
-                    'name': category.name,
-                    'filter': category.alarm_category.regex,
-                    'bg_color': category.alarm_category.bg_color,
-                    'fg_color': category.alarm_category.fg_color
-                }
-                self.settings_manager.set('Categories', str(category_id), json.dumps(category_settings))
-
-        # Used to check for modifications by serialization
-        self._categories_copy = copy.deepcopy(self.categories)
+        # Save only changes
+        changed_categories = self.model.mark_saved()
+        if changed_categories:
+            self.settings_manager.set_categories_settings(changed_categories)
 
     def on_closing(self):
         """
@@ -107,54 +131,137 @@ class CategoriesSettingsDialog(tk.Toplevel):
 
         # Ask for confirmation in case of unsaved changes
         answer = False
-        no_modifications_done = pickle.dumps(self._categories_copy) == pickle.dumps(self.categories)
+        no_modifications_done = not self.model.has_changes
         if not no_modifications_done:
             answer = askyesno(title="Unsaved changes",
                               message="Some changes are not saved.\nAre sure you want to exit ?",
                               default="no")
 
         if no_modifications_done or answer:
+            # Unsaved changes are discarded
+            self.model.revert()
+            if self.match_counter:
+                self.match_counter.stop()
             self.destroy()
 
     def on_filter_change(self, widget, row):
         text = widget.get()
-        self.categories[row].alarm_category.regex = text
+        try:
+            re.compile(text)
+        except re.error as e:
+            # Filters are often invalid while being typed, the last valid one is kept
+            self.invalid_filters[row] = text
+            self.set_match_count(row, 'invalid')
+            logger.debug(f'Category row {row} filter "{text}" is invalid: {e}')
+            return
+
+        was_invalid = self.invalid_filters.pop(row, None) is not None
+        widget.configure(foreground='black')
+        if text == self.model[row].alarm_category.regex and not was_invalid:
+            # Not a change of the filter (e.g. cursor moves)
+            return
+        self.model.set_filter(row, text)
         logger.debug(f'Category row {row} filter set to "{text}"')
+        if self.match_counter:
+            self.set_match_count(row, '...')
+            self.schedule_match_count(row)
+
+    def schedule_match_count(self, row):
+        """
+        Count the symbols matching the row filter once no key was pressed for a while
+        """
+        job = self._match_count_jobs.pop(row, None)
+        if job is not None:
+            self.after_cancel(job)
+        self._match_count_jobs[row] = self.after(MATCH_COUNT_DELAY_MS, self.request_match_count, row)
+
+    def request_match_count(self, row):
+        self._match_count_jobs.pop(row, None)
+        # The count running for the previous filter of the row is cancelled
+        self.match_counter.request(row, self.model.version(row), self.model[row].alarm_category.regex)
+
+    def set_match_count(self, row, text):
+        self.match_counts[row] = text
+        self.category_grid.refresh_item(row)
+
+    def on_match_count(self, event=None):
+        try:
+            while True:
+                row, version, count = self.match_count_queue.get_nowait()
+                # Ignore the counts of filters changed since they were requested
+                if row not in self._match_count_jobs and version == self.model.version(row):
+                    self.set_match_count(row, str(count))
+        except queue.Empty:
+            pass
 
     def on_name_change(self, widget, row):
         text = widget.get()
-        self.categories[row].name = text
+        self.model.set_name(row, text)
         logger.debug(f'Category row {row} name set to "{text}"')
 
-    def show_category(self, parent_frame, row: int, category: CategorySettings):
-        label = ttk.Label(parent_frame, text=f"#{row}: ")
-        label.grid(row=row, column=0, sticky="E")
-
-        name_entry_text = tk.StringVar()
-        name_entry_text.set(category.name)
-        name_entry = tk.Entry(parent_frame,
-                              textvariable=name_entry_text,
-                              width=25,
-                              background=category.alarm_category.bg_color_hex,
-                              foreground=category.alarm_category.fg_color_hex)
-        name_entry.bind('<KeyRelease>', lambda x: self.on_name_change(name_entry, row - 1))
-        self.name_entries.append(name_entry)
-        name_entry.grid(row=row, column=1, padx=5, pady=5)
-
-        filter_entry_text = tk.StringVar()
-        filter_entry_text.set(category.alarm_category.regex)
-        filter_entry = tk.Entry(parent_frame, textvariable=filter_entry_text, width=30)
-        filter_entry.bind('<KeyRelease>', lambda x: self.on_filter_change(filter_entry, row - 1))
-        filter_entry.grid(row=row, column=2, padx=5, pady=5)
-
-        bg_button = tk.Button(parent_frame,
-                              text='     ',
-                              command=lambda: self.choose_color(bg_button, row - 1, BACKGROUND),
-                              bg=category.alarm_category.bg_color_hex)
-        bg_button.grid(row=row, column=3, padx=5)
-
-        fg_button = tk.Button(parent_frame,
-                              text='     ',
-                              command=lambda: self.choose_color(fg_button, row - 1, FOREGROUND),
-                              bg=category.alarm_category.fg_color_hex)
-        fg_button.grid(row=row, column=4, padx=5)
+    def create_category_row(self, parent_frame, grid_row: int) -> 'CategoryRow':
+        return CategoryRow(self, parent_frame, grid_row, show_match_count=self.match_counter is not None)
+
+    def bind_category_row(self, category_row: 'CategoryRow', row):
+        """
+        Show the category at this row on recycled row widgets, or hide them if row is None
+        """
+        category_row.row = row
+        if row is None:
+            for widget in category_row.widgets:
+                widget.grid_remove()
+            return
+
+        category = self.model[row]
+        alarm_category = category.alarm_category
+        category_row.label.configure(text=f"#{row + 1}: ")
+        category_row.name_entry_text.set(category.name)
+        category_row.name_entry.configure(background=alarm_category.bg_color_hex,
+                                          foreground=alarm_category.fg_color_hex)
+        invalid_filter = self.invalid_filters.get(row)
+        category_row.filter_entry_text.set(alarm_category.regex if invalid_filter is None else invalid_filter)
+        category_row.filter_entry.configure(foreground='black' if invalid_filter is None else 'red')
+        category_row.bg_button.configure(bg=alarm_category.bg_color_hex)
+        category_row.fg_button.configure(bg=alarm_category.fg_color_hex)
+        category_row.match_count_label.configure(text=self.match_counts.get(row, ''))
+        for widget in category_row.widgets:
+            widget.grid()
+
+
+class CategoryRow:
+    """
+    Widgets of a row of the categories grid, bound in turn to the categories scrolled into view
+    """
+    def __init__(self, dialog: CategoriesSettingsDialog, parent_frame, grid_row: int, show_match_count: bool):
+        # Row of the category currently shown
+        self.row = None
+
+        self.label = ttk.Label(parent_frame)
+        self.label.grid(row=grid_row, column=0, sticky="E")
+
+        self.name_entry_text = tk.StringVar()
+        self.name_entry = tk.Entry(parent_frame, textvariable=self.name_entry_text, width=25)
+        self.name_entry.bind('<KeyRelease>', lambda x: dialog.on_name_change(self.name_entry, self.row))
+        self.name_entry.grid(row=grid_row, column=1, padx=5, pady=5)
+
+        self.filter_entry_text = tk.StringVar()
+        self.filter_entry = tk.Entry(parent_frame, textvariable=self.filter_entry_text, width=30)
+        self.filter_entry.bind('<KeyRelease>', lambda x: dialog.on_filter_change(self.filter_entry, self.row))
+        self.filter_entry.grid(row=grid_row, column=2, padx=5, pady=5)
+
+        self.bg_button = tk.Button(parent_frame,
+                                   text='     ',
+                                   command=lambda: dialog.choose_color(self.row, BACKGROUND))
+        self.bg_button.grid(row=grid_row, column=3, padx=5)
+
+        self.fg_button = tk.Button(parent_frame,
+                                   text='     ',
+                                   command=lambda: dialog.choose_color(self.row, FOREGROUND))
+        self.fg_button.grid(row=grid_row, column=4, padx=5)
+
+        self.widgets = [self.label, self.name_entry, self.filter_entry, self.bg_button, self.fg_button]
+
+        self.match_count_label = ttk.Label(parent_frame, width=8, anchor='e')
+        if show_match_count:
+            self.match_count_label.grid(row=grid_row, column=5, padx=5)
+            self.widgets.append(self.match_count_label)
@@ -0,0 +1,71 @@
+import logging
+import queue
+import re
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# Number of symbols searched between two checks of the cancellation of a count
+CANCEL_CHECK_INTERVAL = 4096
+
+
+class MatchCounterThread(threading.Thread):
+    """
+    This thread counts the symbols matching categories filters while they are edited, without blocking the UI.
+
+    Counts are requested by category row with the version of the category filter. A pending or running count is
+    cancelled as soon as a count of another version is requested for the same row, so only the last filter typed is
+    fully evaluated. The (row, version, count) results are sent back to the UI thread using the result_queue.
+    The filters are searched in the names with name_prefix added in front, as when the symbols are categorized.
+    """
+    def __init__(self, names, result_queue, name_prefix: str = ''):
+        super().__init__(daemon=True)
+        self.names = names
+        self.name_prefix = name_prefix
+        self.result_queue = result_queue
+        self._request_queue = queue.Queue()
+        # Filter version of the last request by row, any other request of the row is cancelled
+        self._last_requests = {}
+
+    def request(self, row: int, version: int, regex: str):
+        self._last_requests[row] = version
+        self._request_queue.put((row, version, regex))
+
+    def stop(self):
+        self._last_requests.clear()
+        self._request_queue.put(None)
+
+    def is_last_request(self, row: int, version: int) -> bool:
+        return self._last_requests.get(row) == version
+
+    def run(self):
+        names = self.names
+        while (request := self._request_queue.get()) is not None:
+            row, version, regex = request
+            if not self.is_last_request(row, version):
+                continue
+            count = self.count(names, row, version, regex)
+            if count is not None:
+                self.result_queue.put((row, version, count))
+
+    def count(self, names, row: int, version: int, regex: str):
+        """
+        Return the number of names matching the regex, or None if the count was cancelled or the regex is invalid.
+        """
+        # An empty filter never matches, as for the categories
+        if regex == '':
+            return 0
+        try:
+            search = re.compile(regex).search
+        except re.error as e:
+            logger.debug(f'Category row {row} filter "{regex}" not counted: {e}')
+            return None
+
+        name_prefix = self.name_prefix
+        count = 0
+        for start in range(0, len(names), CANCEL_CHECK_INTERVAL):
+            if not self.is_last_request(row, version):
+                return None
+            count += sum(1 for name in names[start:start + CANCEL_CHECK_INTERVAL] if search(name_prefix + name))
+        return count
@@ -0,0 +1,44 @@
+import logging
+import queue
+import tkinter as tk
+
+
+logger = logging.getLogger(__name__)
+
+# Delay between two checks of the items left in the queue, in case waking up the event loop failed
+POLL_INTERVAL_MS = 1000
+
+
+class NotifyingQueue(queue.Queue):
+    """
+    Queue waking up the Tk event loop each time an item is put, by generating a virtual event on a widget.
+
+    It is intended to send results from worker threads to the UI thread: the items are handled by a binding of the
+    virtual event as soon as they are put, instead of polling the queue periodically.
+    Tkinter forwards the event generation from the other threads to the thread running the Tk event loop.
+    If generating the event fails, the item stays queued: the queue is also checked at a low frequency, so the items
+    left are always handled. It must be created in the UI thread.
+    """
+    def __init__(self, widget: tk.Misc, sequence: str, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.widget = widget
+        self.sequence = sequence
+        self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        try:
+            if not self.empty():
+                logger.debug(f'{self.qsize()} items left in the {self.sequence} queue')
+                self.widget.event_generate(self.sequence, when='tail')
+            self.widget.after(POLL_INTERVAL_MS, self._poll)
+        except tk.TclError as e:
+            # The widget is destroyed, nobody is waiting for the items anymore
+            logger.debug(f'{self.sequence} queue not checked anymore: {e}')
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        try:
+            self.widget.event_generate(self.sequence, when='tail')
+        except (RuntimeError, tk.TclError) as e:
+            # The item is handled by the next check of the queue, if the widget still exists
+            logger.warning(f'{self.sequence} not generated, the item is handled later: {e}')
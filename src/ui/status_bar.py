@@ -1,4 +1,5 @@
 import tkinter as tk
+from tkinter import ttk
 
 from .truncated_label import TruncatedLabel
 
@@ -8,6 +9,8 @@ class StatusBar(tk.Frame):
         super().__init__(master, **kwargs)
         self.label = TruncatedLabel(self)
         self.label.pack(side=tk.LEFT)
+        # Only shown while a task reports its progress
+        self.progress_bar = ttk.Progressbar(self, length=100, maximum=1.0)
         self.pack(side=tk.BOTTOM, fill=tk.X)
 
     def set_text(self, value: str):
@@ -16,3 +19,23 @@ class StatusBar(tk.Frame):
 
     def clear_text(self):
         self.label.config(text='')
+
+    def set_progress(self, progress):
+        """
+        Show the progress of a task, with its fraction done if it is known
+        """
+        self.set_text(str(progress))
+        if not self.progress_bar.winfo_ismapped():
+            self.progress_bar.pack(side=tk.RIGHT, before=self.label)
+        fraction = progress.fraction
+        if fraction is None:
+            if str(self.progress_bar.cget('mode')) != 'indeterminate':
+                self.progress_bar.configure(mode='indeterminate')
+                self.progress_bar.start()
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode='determinate', value=fraction)
+
+    def hide_progress(self):
+        self.progress_bar.stop()
+        self.progress_bar.pack_forget()
@@ -0,0 +1,182 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from src.progress import ProgressReporter, TaskCancelled
+from src.task_stats import TaskStats, profiled, timed
+
+
+logger = logging.getLogger(__name__)
+
+# Enough to parse a file while another one is written, without competing with the parallel parsing processes
+DEFAULT_MAX_WORKERS = 2
+# Commands accepted by TaskExecutor.submit(), each one run by the method of the same name prefixed by _
+TASK_COMMANDS = ('parse', 'recategorize', 'write_xls', 'stream_xls')
+
+
+class TaskHandle:
+    """
+    Handle of a task submitted to the TaskExecutor.
+
+    The results of the task are put in the result queue with the task id, so they can be routed back to the code
+    which submitted it. The future gives the final (message, data) result to the code not using the result queue.
+    """
+    def __init__(self, task_id: int, command: str):
+        self.id = task_id
+        self.command = command
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self.stats = TaskStats(command)
+
+    def __repr__(self):
+        return f'TaskHandle({self.id}, {self.command!r})'
+
+    def cancel(self):
+        """
+        Cancel the task, whether it is running or still waiting for a worker. It is thread safe.
+        A 'cancelled' result is sent instead of the task result, unless the task is already done.
+        """
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+
+class TaskExecutor:
+    """
+    This executor runs time-consuming tasks on a small pool of worker threads in order to keep the UI responsive.
+
+    Independent tasks run concurrently, e.g. a file can be parsed while the alarms of another one are written.
+    A task is defined using a command string and its arguments, submit() returns a TaskHandle with the task id.
+
+    The parsing and writing modules (and xlsxwriter) are imported by the first task using them, so they don't delay
+    the application startup.
+
+    Every result is sent back to the UI thread as a (task_id, message, data) tuple in the result queue
+    (a NotifyingQueue wakes up the UI thread as soon as a result is put):
+        - ('progress', Progress) while a long task is running.
+        - ('stats', TaskStats) once the task is done, with the time spent in each phase. They are logged too.
+        - The result of the task, e.g. ('parse_result', (symbol_table, alarms, summary)) or
+          ('write_xls_success', path).
+        - ('cancelled', command) if the task was cancelled or ('error', exception) if it failed.
+    """
+    def __init__(self, result_queue, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.result_queue = result_queue
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='task')
+        self._task_ids = itertools.count(1)
+        # Tasks submitted and not done yet, by id
+        self.tasks: Dict[int, TaskHandle] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, command: str, cmd_args) -> TaskHandle:
+        if command not in TASK_COMMANDS:
+            raise ValueError(f'Unknown task command: {command}')
+        task_function = getattr(self, f'_{command}')
+
+        task = TaskHandle(next(self._task_ids), command)
+        logger.debug(f'{task} - {cmd_args}')
+        with self._lock:
+            self.tasks[task.id] = task
+            task.future = self._executor.submit(self._run, task, task_function, cmd_args)
+        return task
+
+    def cancel_all(self):
+        with self._lock:
+            tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+
+    def shutdown(self):
+        """
+        Cancel every task and stop the workers, without waiting for the running tasks to stop
+        """
+        self.cancel_all()
+        self._executor.shutdown(wait=False)
+
+    def _run(self, task: TaskHandle, task_function, cmd_args):
+        try:
+            # The task may have been cancelled while waiting for a worker
+            if task.cancelled:
+                raise TaskCancelled(f'{task} cancelled')
+            with profiled(f'{task.command}-{task.id}'), timed(task.stats):
+                message, data = task_function(task, *cmd_args)
+        except TaskCancelled as e:
+            logger.info(e)
+            message, data = 'cancelled', task.command
+        except Exception as e:
+            logger.exception(f'{task} failed')
+            message, data = 'error', e
+        finally:
+            with self._lock:
+                del self.tasks[task.id]
+
+        logger.info(f'{task} {message}, {task.stats}', extra={'stats': task.stats.as_dict()})
+        self.result_queue.put((task.id, 'stats', task.stats))
+        self.result_queue.put((task.id, message, data))
+        return message, data
+
+    def progress_reporter(self, task: TaskHandle, name: str) -> ProgressReporter:
+        return ProgressReporter(name,
+                                callback=lambda progress: self.result_queue.put((task.id, 'progress', progress)),
+                                cancel_event=task.cancel_event)
+
+    def _parse(self, task, import_src, symbols_filepath, alarm_categories, parse_options=None):
+        from src.alarm_import import ImportSummary, read_symbol_table
+
+        summary = ImportSummary()
+        symbol_table = read_symbol_table(import_src, symbols_filepath, alarm_categories, summary, parse_options,
+                                         progress=self.progress_reporter(task, 'Reading symbols'))
+        task.stats.add_summary(summary)
+
+        return 'parse_result', (symbol_table, symbol_table.alarms(alarm_categories), summary)
+
+    def _recategorize(self, task, symbol_table, alarm_categories):
+        """
+        Update the alarms of the last parsed file after the categories changed, without parsing it again.
+        """
+        with timed(task.stats, 'match'):
+            # The table shown is left unchanged until the result is handled
+            symbol_table, task.stats.symbols = symbol_table.recategorize(alarm_categories)
+
+        # The file isn't read again, there is no import summary
+        return 'parse_result', (symbol_table, symbol_table.alarms(alarm_categories), None)
+
+    def _write_xls(self, task, alarms, plc_name, xlsx_filepath, alarm_categories, xls_options=None):
+        from src.xls_write import write_xls_from_alarms
+
+        with timed(task.stats, 'write'):
+            task.stats.rows = write_xls_from_alarms(xlsx_filepath, plc_name, alarms, alarm_categories, xls_options,
+                                                    self.progress_reporter(task, 'Writing alarms'))
+
+        return 'write_xls_success', xlsx_filepath
+
+    def _stream_xls(self, task, import_src, symbols_filepath, alarm_categories, plc_name, xlsx_filepath,
+                    parse_options=None, xls_options=None):
+        """
+        Parse the symbols file and write the matching alarms to the XLSX file in a single pass.
+
+        Alarms are written as soon as they are found and are never gathered in a list (xlsxwriter still keeps the
+        rows until the workbook is closed, unless its constant memory mode is enabled), only the import summary is
+        sent back to the UI thread.
+        """
+        from src.alarm_import import ImportSummary, iter_file_alarms
+        from src.xls_write import write_xls_from_alarms
+
+        summary = ImportSummary()
+        # The same progress is updated by the parsing (bytes read, symbols) and by the writing (rows written)
+        progress = self.progress_reporter(task, 'Writing alarms')
+        alarms = iter_file_alarms(import_src, symbols_filepath, alarm_categories, summary, parse_options, progress)
+        with timed(task.stats, 'write'):
+            task.stats.rows = write_xls_from_alarms(xlsx_filepath, plc_name, alarms, alarm_categories, xls_options,
+                                                    progress)
+        task.stats.add_summary(summary)
+        # The symbols are read, parsed and matched while the rows are written
+        task.stats.seconds['write'] -= sum(summary.seconds.values())
+
+        return 'stream_xls_success', (xlsx_filepath, summary)
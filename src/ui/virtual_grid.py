@@ -0,0 +1,123 @@
+from tkinter import ttk
+
+
+class VirtualGrid(ttk.Frame):
+    """
+    Grid of rows showing a long list of items while only creating the widgets of the visible rows.
+
+    A pool of row widgets, as many as the visible rows plus a few overscan ones, is created on demand when the grid
+    is resized. Scrolling doesn't create any widget: the rows of the pool are bound again to the items now visible.
+        - create_row(parent, grid_row): Create the widgets of a row in the parent frame and return them.
+        - bind_row(row, index): Update the widgets of a row created by create_row to show the item at this index.
+        - create_headings(parent): Optional, create the widgets of the grid row 0.
+    """
+    def __init__(self, master, item_count, create_row, bind_row, create_headings=None, overscan=2, **kwargs):
+        super().__init__(master, **kwargs)
+        self.item_count = item_count
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.overscan = overscan
+        # Index of the item shown in the first row
+        self.first = 0
+        self.rows = []
+        self._row_height = None
+
+        # The grid size is given by its master, not by the rows of the pool which may overflow it
+        self.pack_propagate(False)
+        self.rows_frame = ttk.Frame(self)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.rows_frame.pack(side="left", fill="both", expand=True, anchor="n")
+        if create_headings:
+            create_headings(self.rows_frame)
+
+        self.bind("<Configure>", self.on_configure)
+        # Rows height may only be known once the first rows are laid out
+        self.rows_frame.bind("<Configure>", self.on_configure)
+        # Bound on the toplevel so the wheel scrolls the grid whichever row widget is under the pointer
+        toplevel = self.winfo_toplevel()
+        toplevel.bind("<MouseWheel>", self.on_mouse_wheel, add="+")
+        toplevel.bind("<Button-4>", lambda e: self.scroll(-1), add="+")
+        toplevel.bind("<Button-5>", lambda e: self.scroll(1), add="+")
+
+        # At least one row is needed to know the height of the rows
+        self._add_row()
+        self._update_scrollbar()
+
+    @property
+    def visible_count(self) -> int:
+        """
+        Number of rows fitting in the grid height, below the headings
+        """
+        if not self._row_height:
+            return len(self.rows)
+        headings_height = self.rows_frame.grid_bbox(row=0)[3]
+        return max(1, (self.winfo_height() - headings_height) // self._row_height)
+
+    def _add_row(self):
+        grid_row = len(self.rows) + 1
+        row = self.create_row(self.rows_frame, grid_row)
+        self.rows.append(row)
+        self._bind(len(self.rows) - 1)
+
+    def _bind(self, position: int):
+        index = self.first + position
+        self.bind_row(self.rows[position], index if index < self.item_count else None)
+
+    def _measure_row_height(self):
+        # Only known once the rows are laid out in a mapped grid
+        self.update_idletasks()
+        self._row_height = self.rows_frame.grid_bbox(row=1)[3] or None
+
+    def on_configure(self, event=None):
+        if self._row_height is None:
+            self._measure_row_height()
+        needed = self.visible_count + self.overscan
+        while len(self.rows) < needed:
+            self._add_row()
+        self._update_scrollbar()
+
+    def on_mouse_wheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def scroll(self, rows: int):
+        self.scroll_to(self.first + rows)
+
+    def scroll_to(self, first: int):
+        first = max(0, min(first, self.item_count - self.visible_count))
+        if first != self.first:
+            self.first = first
+            self.refresh()
+
+    def refresh(self):
+        """
+        Bind again every row of the pool to the items shown, e.g. after the items changed
+        """
+        for position in range(len(self.rows)):
+            self._bind(position)
+        self._update_scrollbar()
+
+    def set_item_count(self, item_count: int):
+        self.item_count = item_count
+        self.refresh()
+
+    def refresh_item(self, index: int):
+        position = index - self.first
+        if 0 <= position < len(self.rows):
+            self._bind(position)
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * self.item_count))
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if args[2] == "pages":
+                count *= self.visible_count
+            self.scroll(count)
+
+    def _update_scrollbar(self):
+        if self.item_count == 0:
+            self.scrollbar.set(0, 1)
+            return
+        self.scrollbar.set(self.first / self.item_count,
+                           min(1, (self.first + self.visible_count) / self.item_count))
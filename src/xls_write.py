@@ -1,204 +1,239 @@
 import logging
+import os
+import uuid
 import xlsxwriter
-from typing import List
+from collections.abc import Sized
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
 from xlsxwriter.worksheet import Worksheet
 
 from alarm import Alarm
 from category_settings import CategorySettings
+from progress import UPDATE_EVERY, ProgressReporter
 from symbol import Symbol
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class XlsWriteOptions:
+    # Number of alarms above which rows are written to disk as soon as they are complete (xlsxwriter constant_memory
+    # mode) instead of being kept in memory until the workbook is closed. Alarms given by an iterator of unknown
+    # length always use this mode once enabled.
+    # This mode writes inline strings instead of a shared strings table, which hasn't been checked against
+    # EasyBuilder Pro yet: it is disabled by default (0).
+    low_memory_threshold: int = 0
+    # Directory of the temporary files (None: the system temporary directory)
+    tmpdir: Optional[str] = None
+    # Output backend: 'xlsxwriter' or 'stream' (see xlsx_stream_writer)
+    engine: str = 'xlsxwriter'
+
+    def use_low_memory(self, alarms: Iterable[Alarm]) -> bool:
+        if not self.low_memory_threshold:
+            return False
+        return not isinstance(alarms, Sized) or len(alarms) > self.low_memory_threshold
+
+    def workbook_options(self, alarms: Iterable[Alarm]) -> dict:
+        options = {}
+        if self.use_low_memory(alarms):
+            options['constant_memory'] = True
+        if self.tmpdir:
+            options['tmpdir'] = self.tmpdir
+        return options
+
+
+# First row of the sheet: version of the alarms import format
+VERSION_ROW = ['VERSION', '4', 'HARDWARE_VERSION', '159']
+
+HEADERS = [
+    "Catégorie",
+    "Priorité",
+    "Type Adresse",
+    "Nom API (Lecture)",
+    "Type variable (Lecture)",
+    "Tag Système (lecture)",
+    "Tag Utilisateur (Lecture)",
+    "Adresse (Lecture)",
+    "Index (Lecture)",
+    "Format donnée (Lecture)",
+    "Notification activé",
+    "Activé (Notification)",
+    "Nom API (Notification)",
+    "Type variable (Notification)",
+    "Tag Système (Notification)",
+    "Tag Stilisateur (Notification)",
+    "Adresse (Notification)",
+    "Index (Notification)",
+    "Condition",
+    "Valeur de déclenchement",
+    "Contenu",
+    "bibliothèque de Labels activé",
+    "Nom de label",
+    "Police",
+    "Couleur",
+    "Valeur Acquittement",
+    "Son activé",
+    "Nom de la bibliothèque de sons",
+    "Index son",
+    "Nombre de multi-watch",
+    "Nom API (WATCH1)",
+    "Type variable (WATCH1)",
+    "Tag Système (WATCH1)",
+    "Tag Utilisateur (WATCH1)",
+    "Addresse (WATCH1)",
+    "Index (WATCH1)",
+    "Format de donnée (WATCH1)",
+    "Nbr. De mots (WATCH1)",
+    "Nom API (WATCH2)",
+    "Type variable (WATCH2)",
+    "Tag Système (WATCH2)",
+    "Tag Utilisateur (WATCH2)",
+    "Addresse (WATCH2)",
+    "Index (WATCH2)",
+    "Format de donnée (WATCH2)",
+    "Nbr. De mots (WATCH2)",
+    "Nom API (WATCH3)",
+    "Type variable (WATCH3)",
+    "Tag Système (WATCH3)",
+    "Tag Utilisateur (WATCH3)",
+    "Addresse (WATCH3)",
+    "Index (WATCH3)",
+    "Format de donnée (WATCH3)",
+    "Nbr. De mots (WATCH3)",
+    "Nom API (WATCH4)",
+    "Type variable (WATCH4)",
+    "Tag Système (WATCH4)",
+    "Tag Utilisateur (WATCH4)",
+    "Addresse (WATCH4)",
+    "Index (WATCH4)",
+    "Format de donnée (WATCH4)",
+    "Nbr. De mots (WATCH4)",
+    "Nom API (WATCH5)",
+    "Type variable (WATCH5)",
+    "Tag Système (WATCH5)",
+    "Tag Utilisateur (WATCH5)",
+    "Addresse (WATCH5)",
+    "Index (WATCH5)",
+    "Format de donnée (WATCH5)",
+    "Nbr. De mots (WATCH5)",
+    "Nom API (WATCH6)",
+    "Type variable (WATCH6)",
+    "Tag Système (WATCH6)",
+    "Tag Utilisateur (WATCH6)",
+    "Addresse (WATCH6)",
+    "Index (WATCH6)",
+    "Format de donnée (WATCH6)",
+    "Nbr. De mots (WATCH6)",
+    "Nom API (WATCH7)",
+    "Type variable (WATCH7)",
+    "Tag Système (WATCH7)",
+    "Tag Utilisateur (WATCH7)",
+    "Addresse (WATCH7)",
+    "Index (WATCH7)",
+    "Format de donnée (WATCH7)",
+    "Nbr. De mots (WATCH7)",
+    "Nom API (WATCH7)",
+    "Type variable (WATCH8)",
+    "Tag Système (WATCH8)",
+    "Tag Utilisateur (WATCH8)",
+    "Addresse (WATCH8)",
+    "Index (WATCH8)",
+    "Format de donnée (WATCH8)",
+    "Nbr. De mots (WATCH8)",
+    "Bip continu",
+    "Condition d’arrêt du bip continu",
+    "Intervalle des bips",
+    "Envoyer e-mail au déclenchement de l'alarme",
+    "Envoi e-mail au retour à la normale de l'alarme",
+    "Destinataires (déclenchement)",
+    "Destinataires Cc (déclenchement)",
+    "Destinataires Cci (déclenchement)",
+    "Utilise contenu de l'alarme comme sujet (déclenchement)",
+    "Sujet (déclenchement)",
+    "Utilise la bibliothèque label (déclenchement)",
+    "Nom du label (déclenchement)",
+    "Entête (déclenchement)",
+    "Utilise la bibliothèque label (déclenchement)",
+    "Nom du label (Entête)",
+    "Signature (déclenchement)",
+    "Utilise la bibliothèque label (signature)",
+    "Nom du label (signature)",
+    "Capture écran",
+    "Destinataires (Retour à la normale)",
+    "Destinataires Cc (Retour à la normale)",
+    "Destinataires Cci (Retour à la normale)",
+    "Utilise contenu de l'alarme comme sujet (Retour à la normale)",
+    "Sujet (Retour à la normale)",
+    "Utilise la bibliothèque label (Retour à la normale)",
+    "Nom du label (Retour à la normale)",
+    "Entête (Retour à la normale)",
+    "Utilise la bibliothèque label (Retour à la normale)",
+    "Nom du label (Entête)",
+    "Signature (Retour à la normale)",
+    "Utilise la bibliothèque label (signature)",
+    "Nom du label (signature)",
+    "Délais",
+    "Condition dynamique",
+    "Nom API (Condition)",
+    "Type variable (Condition)",
+    "Tag Système (Condition)",
+    "Tag Utilisateur (Condition)",
+    "Adresse (Condition)",
+    "Index (Condition)",
+    "Format donnée (Condition)",
+    "Occurrence",
+    "Nom API (Occurrence)",
+    "Type variable (Occurrence)",
+    "Tag Système (Occurrence)",
+    "Tag Utilisateur (Occurrence)",
+    "Adresse (Occurrence)",
+    "Index (Occurrence)",
+    "Format donnée (Occurrence)",
+    "Dans tolérance",
+    "Hors tolérance",
+    "Suivre",
+    "Utiliser chaine de caractère",
+    "ID Section",
+    "Dynamique",
+    "ID chaine enregistrement",
+    "ID Chaine",
+    "Nom API (ID Chaine)",
+    "Type variable (ID Chaine)",
+    "Tag Système (ID Chaine)",
+    "Tag Utilisateur (ID Chaine)",
+    "Adresse (ID Chaine)",
+    "Index (ID Chaine)",
+    "Format donnée (ID Chaine)",
+    "Push Notification",
+    "Temps écoulé",
+    "Nom API (Temps écoulé)",
+    "Type variable (Temps écoulé)",
+    "Tag Système (Temps écoulé)",
+    "Tag Utilisateur (Temps écoulé)",
+    "Adresse (Temps écoulé)",
+    "Index (Temps écoulé)",
+    "Format donnée (Temps écoulé)",
+    "Couleur de fond",
+    "Couleur (Couleur de fond)",
+    "Sous-catégorie 1",
+    "Sous-catégorie 2",
+    "Contrôle (Activer/Désactiver)",
+    "Mise à ON (Activer/Désactiver)",
+    "Nom du périphérique (Activer/Désactiver)",
+    "Type de périphérique (Activer/Désactiver)",
+    "Tag système (Activer/Désactiver)",
+    "Tag définie par l’utilisateur (Activer/Désactiver)",
+    "Adresse (Activer/Désactiver)",
+    "Index (Activer/Désactiver)"
+]
+
+
 def write_headers(worksheet: Worksheet):
-    worksheet.write('A1', 'VERSION')
-    worksheet.write('B1', '4')
-    worksheet.write('C1', 'HARDWARE_VERSION')
-    worksheet.write('D1', '159')
-
-    headers = [
-        "Catégorie",
-        "Priorité",
-        "Type Adresse",
-        "Nom API (Lecture)",
-        "Type variable (Lecture)",
-        "Tag Système (lecture)",
-        "Tag Utilisateur (Lecture)",
-        "Adresse (Lecture)",
-        "Index (Lecture)",
-        "Format donnée (Lecture)",
-        "Notification activé",
-        "Activé (Notification)",
-        "Nom API (Notification)",
-        "Type variable (Notification)",
-        "Tag Système (Notification)",
-        "Tag Stilisateur (Notification)",
-        "Adresse (Notification)",
-        "Index (Notification)",
-        "Condition",
-        "Valeur de déclenchement",
-        "Contenu",
-        "bibliothèque de Labels activé",
-        "Nom de label",
-        "Police",
-        "Couleur",
-        "Valeur Acquittement",
-        "Son activé",
-        "Nom de la bibliothèque de sons",
-        "Index son",
-        "Nombre de multi-watch",
-        "Nom API (WATCH1)",
-        "Type variable (WATCH1)",
-        "Tag Système (WATCH1)",
-        "Tag Utilisateur (WATCH1)",
-        "Addresse (WATCH1)",
-        "Index (WATCH1)",
-        "Format de donnée (WATCH1)",
-        "Nbr. De mots (WATCH1)",
-        "Nom API (WATCH2)",
-        "Type variable (WATCH2)",
-        "Tag Système (WATCH2)",
-        "Tag Utilisateur (WATCH2)",
-        "Addresse (WATCH2)",
-        "Index (WATCH2)",
-        "Format de donnée (WATCH2)",
-        "Nbr. De mots (WATCH2)",
-        "Nom API (WATCH3)",
-        "Type variable (WATCH3)",
-        "Tag Système (WATCH3)",
-        "Tag Utilisateur (WATCH3)",
-        "Addresse (WATCH3)",
-        "Index (WATCH3)",
-        "Format de donnée (WATCH3)",
-        "Nbr. De mots (WATCH3)",
-        "Nom API (WATCH4)",
-        "Type variable (WATCH4)",
-        "Tag Système (WATCH4)",
-        "Tag Utilisateur (WATCH4)",
-        "Addresse (WATCH4)",
-        "Index (WATCH4)",
-        "Format de donnée (WATCH4)",
-        "Nbr. De mots (WATCH4)",
-        "Nom API (WATCH5)",
-        "Type variable (WATCH5)",
-        "Tag Système (WATCH5)",
-        "Tag Utilisateur (WATCH5)",
-        "Addresse (WATCH5)",
-        "Index (WATCH5)",
-        "Format de donnée (WATCH5)",
-        "Nbr. De mots (WATCH5)",
-        "Nom API (WATCH6)",
-        "Type variable (WATCH6)",
-        "Tag Système (WATCH6)",
-        "Tag Utilisateur (WATCH6)",
-        "Addresse (WATCH6)",
-        "Index (WATCH6)",
-        "Format de donnée (WATCH6)",
-        "Nbr. De mots (WATCH6)",
-        "Nom API (WATCH7)",
-        "Type variable (WATCH7)",
-        "Tag Système (WATCH7)",
-        "Tag Utilisateur (WATCH7)",
-        "Addresse (WATCH7)",
-        "Index (WATCH7)",
-        "Format de donnée (WATCH7)",
-        "Nbr. De mots (WATCH7)",
-        "Nom API (WATCH7)",
-        "Type variable (WATCH8)",
-        "Tag Système (WATCH8)",
-        "Tag Utilisateur (WATCH8)",
-        "Addresse (WATCH8)",
-        "Index (WATCH8)",
-        "Format de donnée (WATCH8)",
-        "Nbr. De mots (WATCH8)",
-        "Bip continu",
-        "Condition d’arrêt du bip continu",
-        "Intervalle des bips",
-        "Envoyer e-mail au déclenchement de l'alarme",
-        "Envoi e-mail au retour à la normale de l'alarme",
-        "Destinataires (déclenchement)",
-        "Destinataires Cc (déclenchement)",
-        "Destinataires Cci (déclenchement)",
-        "Utilise contenu de l'alarme comme sujet (déclenchement)",
-        "Sujet (déclenchement)",
-        "Utilise la bibliothèque label (déclenchement)",
-        "Nom du label (déclenchement)",
-        "Entête (déclenchement)",
-        "Utilise la bibliothèque label (déclenchement)",
-        "Nom du label (Entête)",
-        "Signature (déclenchement)",
-        "Utilise la bibliothèque label (signature)",
-        "Nom du label (signature)",
-        "Capture écran",
-        "Destinataires (Retour à la normale)",
-        "Destinataires Cc (Retour à la normale)",
-        "Destinataires Cci (Retour à la normale)",
-        "Utilise contenu de l'alarme comme sujet (Retour à la normale)",
-        "Sujet (Retour à la normale)",
-        "Utilise la bibliothèque label (Retour à la normale)",
-        "Nom du label (Retour à la normale)",
-        "Entête (Retour à la normale)",
-        "Utilise la bibliothèque label (Retour à la normale)",
-        "Nom du label (Entête)",
-        "Signature (Retour à la normale)",
-        "Utilise la bibliothèque label (signature)",
-        "Nom du label (signature)",
-        "Délais",
-        "Condition dynamique",
-        "Nom API (Condition)",
-        "Type variable (Condition)",
-        "Tag Système (Condition)",
-        "Tag Utilisateur (Condition)",
-        "Adresse (Condition)",
-        "Index (Condition)",
-        "Format donnée (Condition)",
-        "Occurrence",
-        "Nom API (Occurrence)",
-        "Type variable (Occurrence)",
-        "Tag Système (Occurrence)",
-        "Tag Utilisateur (Occurrence)",
-        "Adresse (Occurrence)",
-        "Index (Occurrence)",
-        "Format donnée (Occurrence)",
-        "Dans tolérance",
-        "Hors tolérance",
-        "Suivre",
-        "Utiliser chaine de caractère",
-        "ID Section",
-        "Dynamique",
-        "ID chaine enregistrement",
-        "ID Chaine",
-        "Nom API (ID Chaine)",
-        "Type variable (ID Chaine)",
-        "Tag Système (ID Chaine)",
-        "Tag Utilisateur (ID Chaine)",
-        "Adresse (ID Chaine)",
-        "Index (ID Chaine)",
-        "Format donnée (ID Chaine)",
-        "Push Notification",
-        "Temps écoulé",
-        "Nom API (Temps écoulé)",
-        "Type variable (Temps écoulé)",
-        "Tag Système (Temps écoulé)",
-        "Tag Utilisateur (Temps écoulé)",
-        "Adresse (Temps écoulé)",
-        "Index (Temps écoulé)",
-        "Format donnée (Temps écoulé)",
-        "Couleur de fond",
-        "Couleur (Couleur de fond)",
-        "Sous-catégorie 1",
-        "Sous-catégorie 2",
-        "Contrôle (Activer/Désactiver)",
-        "Mise à ON (Activer/Désactiver)",
-        "Nom du périphérique (Activer/Désactiver)",
-        "Type de périphérique (Activer/Désactiver)",
-        "Tag système (Activer/Désactiver)",
-        "Tag définie par l’utilisateur (Activer/Désactiver)",
-        "Adresse (Activer/Désactiver)",
-        "Index (Activer/Désactiver)"
-    ]
+    for i, value in enumerate(VERSION_ROW):
+        worksheet.write(0, i, value)
 
-    for i, header in enumerate(headers):
+    for i, header in enumerate(HEADERS):
         worksheet.write(1, i, header)
 
 
@@ -397,16 +432,118 @@ def write_row(worksheet: Worksheet, row_id, row_data):
         worksheet.write(row_id, col_id, value)
 
 
-def write_rows_from_alarms(worksheet: Worksheet, plc_name: str, alarms: List[Alarm], categories_settings: List[CategorySettings]):
+# Placeholders used to locate the alarm specific cells in the rows returned by get_row_data()
+_ADDRESS_PLACEHOLDER = '\x00address\x00'
+_MESSAGE_PLACEHOLDER = '\x00message\x00'
+
+
+class RowTemplate:
+    """
+    Precomputed row of a (category, PLC name) pair: only the address and the message change from an alarm to another.
+
+    Empty cells are dropped as writing an empty string without format doesn't write anything.
+    """
+    def __init__(self, category_id: int, plc_name: str, categories_settings: List[CategorySettings]):
+        placeholder_symbol = Symbol(name=_ADDRESS_PLACEHOLDER, type='', comment=_MESSAGE_PLACEHOLDER)
+        row_data = get_row_data(category_id, plc_name, placeholder_symbol, categories_settings)
+
+        self.cells = tuple((col_id, value) for col_id, value in enumerate(row_data)
+                           if value != '' and value not in (_ADDRESS_PLACEHOLDER, _MESSAGE_PLACEHOLDER))
+        self.address_columns = tuple(i for i, value in enumerate(row_data) if value == _ADDRESS_PLACEHOLDER)
+        self.message_columns = tuple(i for i, value in enumerate(row_data) if value == _MESSAGE_PLACEHOLDER)
+
+    def write(self, worksheet: Worksheet, row_id: int, address: str, message: str):
+        write_string = worksheet.write_string
+        for col_id, value in self.cells:
+            write_string(row_id, col_id, value)
+        if address:
+            for col_id in self.address_columns:
+                write_string(row_id, col_id, address)
+        if message:
+            for col_id in self.message_columns:
+                write_string(row_id, col_id, message)
+
+
+def write_rows_from_alarms(worksheet: Worksheet, plc_name: str, alarms: Iterable[Alarm], categories_settings: List[CategorySettings],
+                           progress: ProgressReporter = None) -> int:
+    """
+    Write a row for each alarm and return the number of rows written.
+
+    Alarms may be given by any iterable, including a generator which is consumed only once.
+    Rows are written strictly in order, as required by the constant_memory mode.
+    """
+    templates = {}
     row_id = 2  # Starts writing at row 3
     for alarm in alarms:
-        row_data = get_row_data(alarm.category.id, plc_name, alarm.symbol, categories_settings)
-        write_row(worksheet, row_id, row_data)
+        if progress is not None and row_id % UPDATE_EVERY == 0:
+            progress.update(rows=row_id - 2)
+        category_id = alarm.category.id
+        template = templates.get(category_id)
+        if template is None:
+            template = templates[category_id] = RowTemplate(category_id, plc_name, categories_settings)
+        template.write(worksheet, row_id, alarm.symbol.name, alarm.symbol.comment)
         row_id += 1
+    return row_id - 2
+
 
+def write_xls_from_alarms(fname: str, plc_name: str, alarms: Iterable[Alarm], categories_settings: List[CategorySettings],
+                          options: XlsWriteOptions = None, progress: ProgressReporter = None) -> int:
+    """
+    Write the alarms workbook and return the number of alarm rows written.
 
-def write_xls_from_alarms(fname: str, plc_name: str, alarms: List[Alarm], categories_settings: List[CategorySettings]):
-    with xlsxwriter.Workbook(fname) as workbook:
+    The progress, if given, is updated with the rows written and may cancel the writing. The workbook is written to
+    a temporary file next to fname which replaces it once complete, so a previous workbook is left untouched if the
+    writing is cancelled or fails.
+    """
+    if options is None:
+        options = XlsWriteOptions()
+    if progress is not None and isinstance(alarms, Sized):
+        progress.update(total_rows=len(alarms))
+    target = Path(fname)
+    # Created by the writer, so it gets the permissions of a new file unlike a mkstemp() file
+    tmp_path = target.with_name(f'{target.name}.{uuid.uuid4().hex[:8]}.tmp')
+    try:
+        rows = _write_xls_from_alarms(str(tmp_path), plc_name, alarms, categories_settings, options, progress)
+        os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return rows
+
+
+def _write_xls_from_alarms(fname: str, plc_name: str, alarms: Iterable[Alarm],
+                           categories_settings: List[CategorySettings], options: XlsWriteOptions,
+                           progress: ProgressReporter = None) -> int:
+    if options.engine == 'stream':
+        # Imported here as the stream writer reuses the rows layout defined in this module
+        from xlsx_stream_writer import write_xlsx_stream
+        logger.debug(f'Writing {fname} with the stream writer')
+        return write_xlsx_stream(fname, plc_name, alarms, categories_settings, options.tmpdir, progress)
+    elif options.engine != 'xlsxwriter':
+        raise ValueError(f'Unknown XLSX engine: {options.engine}')
+
+    workbook_options = options.workbook_options(alarms)
+    logger.debug(f'Writing {fname} with options {workbook_options}')
+    # Not used as a context manager: closing the workbook writes it whole, which would delay a cancellation by as
+    # long as writing the rows already added
+    workbook = xlsxwriter.Workbook(fname, workbook_options)
+    try:
         worksheet = workbook.add_worksheet()
         write_headers(worksheet)
-        write_rows_from_alarms(worksheet, plc_name, alarms, categories_settings)
+        rows = write_rows_from_alarms(worksheet, plc_name, alarms, categories_settings, progress)
+    except BaseException:
+        _discard_workbook(workbook)
+        raise
+    workbook.close()
+    return rows
+
+
+def _discard_workbook(workbook: xlsxwriter.Workbook):
+    """
+    Remove the temporary files of a workbook which won't be closed (constant_memory mode), nothing is written to the
+    workbook file before it is closed
+    """
+    for worksheet in workbook.worksheets():
+        if worksheet.row_data_filename is not None:
+            worksheet._opt_close()
+            Path(worksheet.row_data_filename).unlink(missing_ok=True)
@@ -0,0 +1,312 @@
+"""
+Purpose-built XLSX writer for the EasyBuilder Pro alarms sheet.
+
+The sheet always has the same layout: two header rows followed by one row per alarm where only the address and the
+message change for a given category. Constant cells are encoded to XML bytes once per category and every row is
+assembled from those segments. Rows and shared strings are streamed to temporary files, so the memory used doesn't
+depend on the number of alarms, then copied into the zip container along with the fixed package parts.
+The package mirrors the parts written by xlsxwriter.
+"""
+import logging
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from alarm import Alarm
+from category_settings import CategorySettings
+from progress import UPDATE_EVERY, ProgressReporter
+from xls_write import HEADERS, VERSION_ROW, RowTemplate
+
+
+logger = logging.getLogger(__name__)
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_CONTENT_TYPES = (
+    _XML_DECLARATION +
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/docProps/app.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>'
+    '<Override PartName="/docProps/core.xml" '
+    'ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    _XML_DECLARATION +
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+    'Target="docProps/core.xml"/>'
+    '<Relationship Id="rId3" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties" '
+    'Target="docProps/app.xml"/>'
+    '</Relationships>'
+)
+
+_APP = (
+    _XML_DECLARATION +
+    '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" '
+    'xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">'
+    '<Application>Microsoft Excel</Application><DocSecurity>0</DocSecurity><ScaleCrop>false</ScaleCrop>'
+    '<HeadingPairs><vt:vector size="2" baseType="variant"><vt:variant><vt:lpstr>Worksheets</vt:lpstr></vt:variant>'
+    '<vt:variant><vt:i4>1</vt:i4></vt:variant></vt:vector></HeadingPairs>'
+    '<TitlesOfParts><vt:vector size="1" baseType="lpstr"><vt:lpstr>Sheet1</vt:lpstr></vt:vector></TitlesOfParts>'
+    '<Company></Company><LinksUpToDate>false</LinksUpToDate><SharedDoc>false</SharedDoc>'
+    '<HyperlinksChanged>false</HyperlinksChanged><AppVersion>12.0000</AppVersion></Properties>'
+)
+
+_CORE = (
+    _XML_DECLARATION +
+    '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+    'xmlns:dcmitype="http://purl.org/dc/dcmitype/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+    '<dc:creator></dc:creator><cp:lastModifiedBy></cp:lastModifiedBy>'
+    '<dcterms:created xsi:type="dcterms:W3CDTF">{date}</dcterms:created>'
+    '<dcterms:modified xsi:type="dcterms:W3CDTF">{date}</dcterms:modified></cp:coreProperties>'
+)
+
+_WORKBOOK = (
+    _XML_DECLARATION +
+    f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+    '<fileVersion appName="xl" lastEdited="4" lowestEdited="4" rupBuild="4505"/>'
+    '<workbookPr defaultThemeVersion="124226"/>'
+    '<bookViews><workbookView xWindow="240" yWindow="15" windowWidth="16095" windowHeight="9660"/></bookViews>'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+    '<calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'
+)
+
+_WORKBOOK_RELS = (
+    _XML_DECLARATION +
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+    f'<Relationship Id="rId3" Type="{_REL_NS}/sharedStrings" Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES = (
+    _XML_DECLARATION +
+    f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>'
+    '</fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '<dxfs count="0"/><tableStyles count="0" defaultTableStyle="TableStyleMedium9" '
+    'defaultPivotStyle="PivotStyleLight16"/></styleSheet>'
+)
+
+_SHEET_HEADER = (
+    _XML_DECLARATION +
+    f'<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+    '<dimension ref="{dimension}"/>'
+    '<sheetViews><sheetView tabSelected="1" workbookViewId="0"/></sheetViews>'
+    '<sheetFormatPr defaultRowHeight="15"/><sheetData>'
+)
+_SHEET_FOOTER = (
+    '</sheetData>'
+    '<pageMargins left="0.7" right="0.7" top="0.75" bottom="0.75" header="0.3" footer="0.3"/></worksheet>'
+)
+
+_ESCAPED_ESCAPE_RE = re.compile(r'(_x[0-9a-fA-F]{4}_)')
+_CONTROL_CHARS_RE = re.compile(r'([\x00-\x08\x0B-\x1F])')
+
+
+def column_name(col_id: int) -> str:
+    name = ''
+    col_id += 1
+    while col_id:
+        col_id, remainder = divmod(col_id - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def _escape_string(string: str) -> bytes:
+    """
+    Return the <si> element of a shared string, escaped as xlsxwriter does.
+    """
+    string = string.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if '_x' in string:
+        string = _ESCAPED_ESCAPE_RE.sub(r'_x005F\1', string)
+    string = _CONTROL_CHARS_RE.sub(lambda m: f'_x{ord(m.group(1)):04X}_', string)
+    string = string.replace('\uFFFE', '_xFFFE_').replace('\uFFFF', '_xFFFF_')
+    if string[:1].isspace() or string[-1:].isspace():
+        return f'<si><t xml:space="preserve">{string}</t></si>'.encode()
+    return f'<si><t>{string}</t></si>'.encode()
+
+
+class SharedStrings:
+    """
+    Shared strings table streamed to a temporary file.
+
+    Constant strings are stored once, the alarm specific strings (mostly unique) are appended without lookup so the
+    memory used stays bounded.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+        self.unique_count = 0
+        self._indexes = {}
+
+    def _append(self, string: str) -> int:
+        self.file.write(_escape_string(string))
+        self.unique_count += 1
+        return self.unique_count - 1
+
+    def constant(self, string: str) -> int:
+        index = self._indexes.get(string)
+        if index is None:
+            index = self._indexes[string] = self._append(string)
+        return index
+
+    def unique(self, string: str) -> int:
+        return self._append(string)
+
+
+class EncodedRowTemplate:
+    """
+    Cells of a RowTemplate encoded to XML bytes.
+
+    Chunks are either (None, parts): constant cells as byte parts to join with the row number,
+    or (kind, cell start): an alarm specific cell whose row number and value are appended when writing the row.
+    """
+    ADDRESS = 'address'
+    MESSAGE = 'message'
+
+    def __init__(self, template: RowTemplate, shared_strings: SharedStrings):
+        cells = [(col_id, None, shared_strings.constant(value)) for col_id, value in template.cells]
+        cells.extend((col_id, self.ADDRESS, None) for col_id in template.address_columns)
+        cells.extend((col_id, self.MESSAGE, None) for col_id in template.message_columns)
+        cells.sort(key=lambda cell: cell[0])
+
+        self.constant_count = len(template.cells)
+        self.address_count = len(template.address_columns)
+        self.message_count = len(template.message_columns)
+        self.last_column = max((cell[0] for cell in cells), default=0)
+
+        self.chunks = []
+        parts = [b'']
+        for col_id, kind, index in cells:
+            cell_start = f'<c r="{column_name(col_id)}'.encode()
+            if kind is not None:
+                self.chunks.append((None, parts))
+                self.chunks.append((kind, cell_start))
+                parts = [b'']
+            else:
+                parts[-1] += cell_start
+                parts.append(f'" t="s"><v>{index}</v></c>'.encode())
+        self.chunks.append((None, parts))
+
+
+def _cells_row(row: bytes, cells: List[bytes]) -> bytes:
+    return b'<row r="' + row + b'">' + b''.join(cells) + b'</row>'
+
+
+def write_xlsx_stream(fname: str, plc_name: str, alarms: Iterable[Alarm], categories_settings: List[CategorySettings],
+                      tmpdir: Optional[str] = None, progress: ProgressReporter = None) -> int:
+    """
+    Write the alarms sheet and return the number of alarm rows written.
+    """
+    address_kind = EncodedRowTemplate.ADDRESS
+    string_cells = 0
+    with tempfile.TemporaryFile(dir=tmpdir) as sheet_file, tempfile.TemporaryFile(dir=tmpdir) as strings_file:
+        shared_strings = SharedStrings(strings_file)
+        write = sheet_file.write
+        last_column = max(len(VERSION_ROW), len(HEADERS)) - 1
+
+        for row_id, values in ((0, VERSION_ROW), (1, HEADERS)):
+            row = str(row_id + 1).encode()
+            write(_cells_row(row, [
+                f'<c r="{column_name(col_id)}{row_id + 1}" t="s"><v>{shared_strings.constant(value)}</v></c>'.encode()
+                for col_id, value in enumerate(values)
+            ]))
+            string_cells += len(values)
+
+        templates = {}
+        row_number = 2
+        for alarm in alarms:
+            if progress is not None and row_number % UPDATE_EVERY == 0:
+                progress.update(rows=row_number - 2)
+            category_id = alarm.category.id
+            template = templates.get(category_id)
+            if template is None:
+                row_template = RowTemplate(category_id, plc_name, categories_settings)
+                template = templates[category_id] = EncodedRowTemplate(row_template, shared_strings)
+                last_column = max(last_column, template.last_column)
+
+            row_number += 1
+            row = str(row_number).encode()
+            address = alarm.symbol.name
+            message = alarm.symbol.comment
+            # Address and message are written to several columns but stored once
+            address_index = f'" t="s"><v>{shared_strings.unique(address)}</v></c>'.encode() if address else None
+            message_index = f'" t="s"><v>{shared_strings.unique(message)}</v></c>'.encode() if message else None
+            string_cells += (template.constant_count
+                             + (template.address_count if address else 0)
+                             + (template.message_count if message else 0))
+
+            buffer = [b'<row r="', row, b'">']
+            for kind, data in template.chunks:
+                if kind is None:
+                    buffer.append(row.join(data))
+                    continue
+                cell_end = address_index if kind is address_kind else message_index
+                if cell_end is not None:
+                    buffer.append(data)
+                    buffer.append(row)
+                    buffer.append(cell_end)
+            buffer.append(b'</row>')
+            write(b''.join(buffer))
+
+        if progress is not None:
+            progress.update(rows=row_number - 2)
+        shared_strings.count = string_cells
+        dimension = f'A1:{column_name(last_column)}{row_number}'
+        _write_package(fname, sheet_file, shared_strings, dimension)
+
+    return row_number - 2
+
+
+def _copy_part(archive: zipfile.ZipFile, name: str, header: str, file, footer: str):
+    file.seek(0)
+    with archive.open(name, 'w', force_zip64=True) as part:
+        part.write(header.encode())
+        shutil.copyfileobj(file, part, 1024 * 1024)
+        part.write(footer.encode())
+
+
+def _write_package(fname: str, sheet_file, shared_strings: SharedStrings, dimension: str):
+    date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    with zipfile.ZipFile(fname, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        _copy_part(archive, 'xl/worksheets/sheet1.xml',
+                   _SHEET_HEADER.format(dimension=dimension), sheet_file, _SHEET_FOOTER)
+        archive.writestr('xl/workbook.xml', _WORKBOOK)
+        _copy_part(archive, 'xl/sharedStrings.xml',
+                   _XML_DECLARATION + f'<sst xmlns="{_MAIN_NS}" count="{shared_strings.count}" '
+                                      f'uniqueCount="{shared_strings.unique_count}">',
+                   shared_strings.file, '</sst>')
+        archive.writestr('xl/styles.xml', _STYLES)
+        archive.writestr('docProps/core.xml', _CORE.format(date=date))
+        archive.writestr('docProps/app.xml', _APP)
@@ -0,0 +1,132 @@
+"""
+Check the xlsxwriter and the stream XLSX writer backends write the same cells, read back from the packages.
+"""
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / 'src')]
+
+from alarm import Alarm  # noqa: E402
+from category_settings import CategorySettings  # noqa: E402
+from symbol import Symbol  # noqa: E402
+from xls_write import XlsWriteOptions, write_xls_from_alarms  # noqa: E402
+
+NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+# Number formats predefined by Excel used by the workbooks, the others are defined in the styles
+BUILTIN_NUM_FORMATS = {'0': 'General', '1': '0', '49': '@'}
+
+# Font properties referencing the theme, which the stream package doesn't have: the default text color of the theme
+# is the default color and the font scheme doesn't apply without a theme
+THEME_FONT_PROPERTIES = {('color', (('theme', '1'),)), ('scheme', (('val', 'minor'),))}
+
+
+def _canonical(element: ET.Element) -> tuple:
+    """
+    Return the tag, attributes and children of an element, independent of the attributes order
+    """
+    return (element.tag, tuple(sorted(element.attrib.items())), (element.text or '').strip(),
+            tuple(_canonical(child) for child in element))
+
+
+def _read_formats(archive: zipfile.ZipFile) -> list:
+    """
+    Return the formats of the cell styles by index, with the number format, font, fill, border and alignment they
+    reference instead of their indexes, as each writer may number them differently
+    """
+    styles = ET.fromstring(archive.read('xl/styles.xml'))
+    num_formats = dict(BUILTIN_NUM_FORMATS)
+    for num_format in styles.iterfind('m:numFmts/m:numFmt', NS):
+        num_formats[num_format.get('numFmtId')] = num_format.get('formatCode')
+    fonts = []
+    for font in styles.iterfind('m:fonts/m:font', NS):
+        properties = [prop for prop in font
+                      if (prop.tag.split('}')[1], tuple(sorted(prop.attrib.items()))) not in THEME_FONT_PROPERTIES]
+        fonts.append(tuple(_canonical(prop) for prop in properties))
+    fills = [_canonical(fill) for fill in styles.iterfind('m:fills/m:fill', NS)]
+    borders = [_canonical(border) for border in styles.iterfind('m:borders/m:border', NS)]
+    formats = []
+    for xf in styles.iterfind('m:cellXfs/m:xf', NS):
+        alignment = xf.find('m:alignment', NS)
+        formats.append((num_formats[xf.get('numFmtId', '0')],
+                        fonts[int(xf.get('fontId', '0'))],
+                        fills[int(xf.get('fillId', '0'))],
+                        borders[int(xf.get('borderId', '0'))],
+                        None if alignment is None else _canonical(alignment)))
+    return formats
+
+
+def read_cells(fname) -> dict:
+    """
+    Return the (type, value, format) of the cells of the first worksheet of a XLSX file, by reference.
+
+    Shared and inline strings have the same 'str' type, as the xlsxwriter low memory mode writes inline strings.
+    """
+    with zipfile.ZipFile(fname) as archive:
+        assert archive.testzip() is None
+        strings = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            for si in ET.fromstring(archive.read('xl/sharedStrings.xml')).iterfind('m:si', NS):
+                strings.append(''.join(t.text or '' for t in si.iter(f'{{{NS["m"]}}}t')))
+        formats = _read_formats(archive)
+        sheet = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+
+    cells = {}
+    for c in sheet.iter(f'{{{NS["m"]}}}c'):
+        cell_type = c.get('t', 'n')
+        if cell_type == 's':
+            cell_type, value = 'str', strings[int(c.find('m:v', NS).text)]
+        elif cell_type == 'inlineStr':
+            cell_type, value = 'str', ''.join(t.text or '' for t in c.iter(f'{{{NS["m"]}}}t'))
+        else:
+            v = c.find('m:v', NS)
+            value = None if v is None else v.text
+        cells[c.get('r')] = (cell_type, value, formats[int(c.get('s', '0'))])
+    return cells
+
+
+@pytest.fixture
+def categories():
+    categories = [CategorySettings(regex=f'Unit{i}', bg_color=(i * 30, 0, 255 - i), fg_color=(0, i * 20, 0))
+                  for i in range(8)]
+    # Rows reference the categories by id
+    return {category.alarm_category.id: category for category in categories}
+
+
+@pytest.fixture
+def alarms(categories):
+    categories = list(categories.values())
+    alarms = [
+        Alarm(symbol=Symbol(name=f'VAR://Program{i % 40}.Unit{i % 7}.bAlm_{i}', type='BOOL',
+                            comment=f'Alarm {i}\\nUnit {i % 7}'),
+              category=categories[i % len(categories)].alarm_category)
+        for i in range(1000)
+    ]
+    # Escaping corner cases
+    alarms[0].symbol.comment = ' <Alarm> & "quotes" _x0041_ \x01 '
+    alarms[1].symbol.comment = 'Défaut pression ≥ 10 bar'
+    alarms[2].symbol.comment = ''
+    return alarms
+
+
+@pytest.mark.parametrize('low_memory_threshold', [0, 1])
+def test_engines_write_same_cells(tmp_path, alarms, categories, low_memory_threshold):
+    reference_fname = tmp_path / 'xlsxwriter.xlsx'
+    stream_fname = tmp_path / 'stream.xlsx'
+    xlsxwriter_options = XlsWriteOptions(engine='xlsxwriter', low_memory_threshold=low_memory_threshold,
+                                         tmpdir=str(tmp_path))
+    stream_options = XlsWriteOptions(engine='stream', tmpdir=str(tmp_path))
+
+    assert write_xls_from_alarms(str(reference_fname), 'PLC', alarms, categories, xlsxwriter_options) == len(alarms)
+    assert write_xls_from_alarms(str(stream_fname), 'PLC', alarms, categories, stream_options) == len(alarms)
+
+    reference = read_cells(reference_fname)
+    stream = read_cells(stream_fname)
+    # Version and headers rows, then a row by alarm
+    assert max(int(ref.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')) for ref in reference) == len(alarms) + 2
+    assert stream == reference